@@ -0,0 +1,209 @@
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Roughly the Maharashtra bounding box, where all real pincodes and hospitals lie
+LATITUDE_RANGE = (15.6, 22.0)
+LONGITUDE_RANGE = (72.6, 80.9)
+PINCODE_RANGE = (400001, 445999)
+
+SPECIALITY_CODES = ["S1", "S2", "S3", "S4", "S5", "S9", "S10", "S14", "M3", "M5", "M6", "M7", "M8",
+                    "M9", "M10", "M14", "M16"]
+DISTRICTS = ["Pune", "Mumbai", "Nagpur", "Nashik", "Thane", "Aurangabad", "Solapur", "Kolhapur",
+             "Amravati", "Latur"]
+HEALTH_TERMS = ["fever", "dengue", "malaria", "tuberculosis", "diabetes", "hypertension", "pregnancy",
+                "vaccination", "nutrition", "anaemia", "cataract", "dialysis", "cardiology", "cancer",
+                "insurance", "scheme", "eligibility", "ration", "card", "cashless", "treatment", "package",
+                "hospital", "claim", "surgery", "child", "mother", "elderly", "clinic", "ambulance",
+                "arogya", "yojana", "jan", "mahatma", "phule", "registration", "documents", "coverage"]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for Gemini that follows a fixed script of tool calls.
+
+    On each turn the model requests the tool calls of `script[n]`, where n is the
+    number of tool-calling rounds it has already made since the last user message,
+    and answers with `answer` once the script is exhausted or tools are disabled
+    (`bind_tools(..., tool_choice="none")`). Tool arguments may be callables that
+    receive the user's message. The answer is streamed word by word.
+
+    Args:
+        script: Tool-call rounds, each a list of (tool name, args or args factory).
+        answer: Final answer text.
+        first_token_latency: Seconds before the first chunk of each response.
+        token_latency: Seconds between the following chunks.
+    """
+    script: List[List[Any]] = []
+    answer: str = "Here are the nearest hospitals and the relevant scheme information."
+    first_token_latency: float = 0.3
+    token_latency: float = 0.01
+    tool_calls_enabled: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[str] = None, **kwargs: Any) -> "ScriptedChatModel":
+        return self.model_copy(update={"tool_calls_enabled": tool_choice != "none"})
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        user_text, rounds = "", 0
+        for message in reversed(messages):
+            if isinstance(message, HumanMessage):
+                user_text = message.content if isinstance(message.content, str) else str(message.content)
+                break
+            if isinstance(message, AIMessage) and message.tool_calls:
+                rounds += 1
+
+        if not self.tool_calls_enabled or rounds >= len(self.script):
+            return AIMessage(content=self.answer)
+        tool_calls = [
+            {
+                "name": name,
+                "args": args(user_text) if callable(args) else dict(args),
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "tool_call",
+            }
+            for name, args in self.script[rounds]
+        ]
+        return AIMessage(content="", tool_calls=tool_calls)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        message = self._respond(messages)
+        words = message.content.split(" ") if message.content else []
+        time.sleep(self.first_token_latency + self.token_latency * max(len(words) - 1, 0))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any):
+        message = self._respond(messages)
+        await asyncio.sleep(self.first_token_latency)
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i,
+                 "type": "tool_call_chunk"}
+                for i, call in enumerate(message.tool_calls)
+            ]))
+            return
+        for i, word in enumerate(message.content.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}"))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic unit vectors derived from a hash of the text, with an optional simulated API latency.
+    """
+
+    def __init__(self, size: int = 256, latency_seconds: float = 0.0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_seconds)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_seconds)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency_seconds)
+        return self._vector(text)
+
+
+def synthetic_pincodes(count: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Post offices with the columns of india_pincodes.csv, two per pincode."""
+    pincodes = rng.choice(np.arange(PINCODE_RANGE[0], PINCODE_RANGE[1] + 1), size=count, replace=False)
+    latitudes = rng.uniform(*LATITUDE_RANGE, size=count)
+    longitudes = rng.uniform(*LONGITUDE_RANGE, size=count)
+    # Two post offices a few hundred metres apart, so the table has to average them
+    offsets = rng.normal(scale=0.003, size=(2, count, 2))
+    return pd.DataFrame({
+        "postal code ": np.concatenate([pincodes, pincodes]),
+        "latitude": np.concatenate([latitudes + offsets[0, :, 0], latitudes + offsets[1, :, 0]]),
+        "longitude": np.concatenate([longitudes + offsets[0, :, 1], longitudes + offsets[1, :, 1]]),
+    })
+
+
+def synthetic_hospitals(count: int, pincodes: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    """Hospitals in the shape of hospital_data_enriched.parquet, clustered within ~10 km of the pincodes."""
+    anchors = pincodes.iloc[rng.integers(0, len(pincodes), size=count)]
+    specialities = [
+        ", ".join(rng.choice(SPECIALITY_CODES, size=rng.integers(1, 6), replace=False))
+        for _ in range(count)
+    ]
+    districts = rng.choice(DISTRICTS, size=count)
+    return pd.DataFrame({
+        "S.No": pd.array(np.arange(1, count + 1), dtype="Int64"),
+        "Hospital_ID": [f"HOSP{i:06d}" for i in range(count)],
+        "Specialties": specialities,
+        "HOSP_DISP_CODE": [f"D{i:06d}" for i in range(count)],
+        "District": districts,
+        "Taluka": districts,
+        "Hospital_Name": [f"Synthetic Hospital {i}" for i in range(count)],
+        "Address": [f"{i} Main Road, {district}" for i, district in enumerate(districts)],
+        "Pincode": anchors["postal code "].astype(str).to_numpy(),
+        "MCO_Contact_Number": [f"98{i:08d}" for i in range(count)],
+        "Email": [f"hospital{i}@example.org" for i in range(count)],
+        "latitude": anchors["latitude"].to_numpy() + rng.normal(scale=0.05, size=count),
+        "longitude": anchors["longitude"].to_numpy() + rng.normal(scale=0.05, size=count),
+        "geo_quality": "pincode_centroid",
+    })
+
+
+def synthetic_documents(count: int, rng: np.random.Generator, sources: int = 10,
+                        words_per_chunk: int = 120) -> Tuple[List[str], List[dict], List[str]]:
+    """Chunks of health vocabulary with the metadata and ids vectorization.py gives real PDF chunks."""
+    texts, metadatas, ids = [], [], []
+    for i in range(count):
+        source = f"scheme_{i % sources}.pdf"
+        chunk = i // sources
+        texts.append(" ".join(rng.choice(HEALTH_TERMS, size=words_per_chunk)))
+        metadatas.append({"source": source, "chunk": chunk})
+        ids.append(f"{source}:{chunk}")
+    return texts, metadatas, ids
+
+
+def write_synthetic_dataset(directory: str, hospitals: int = 5000, pincodes: int = 2000,
+                            seed: int = 0) -> Tuple[str, str, np.ndarray]:
+    """
+    Write a synthetic hospital parquet and pincode CSV.
+
+    Returns:
+        The hospitals path, the pincodes path and the known pincodes.
+    """
+    rng = np.random.default_rng(seed)
+    pincode_df = synthetic_pincodes(pincodes, rng)
+    hospital_df = synthetic_hospitals(hospitals, pincode_df, rng)
+
+    hospitals_path = f"{directory}/hospital_data_enriched.parquet"
+    pincodes_path = f"{directory}/india_pincodes.csv"
+    hospital_df.to_parquet(hospitals_path, index=False)
+    pincode_df.to_csv(pincodes_path, index=False)
+    return hospitals_path, pincodes_path, np.unique(pincode_df["postal code "].to_numpy())
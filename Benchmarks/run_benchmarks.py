@@ -0,0 +1,303 @@
+"""
+End-to-end latency benchmarks for the chat server, the agent loop and the MCP tools.
+
+Everything runs in one process against local stand-ins: Gemini is replaced by a
+scripted chat model with configurable latency, the embedding API by hashed
+vectors, and the hospital and pincode files by a synthetic dataset. The numbers
+therefore measure our own code, and a regression shows up as a change against a
+saved baseline.
+
+    python run_benchmarks.py --concurrency 1 4 16 64 --requests 200 --output results.json
+    python run_benchmarks.py --baseline results.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(BENCHMARK_DIR, "..", "Chat Server"), os.path.join(BENCHMARK_DIR, "..", "MCP Server")]
+
+from fakes import HEALTH_TERMS, HashEmbeddings, ScriptedChatModel, synthetic_documents, write_synthetic_dataset
+
+SCENARIOS = ["mcp_tools", "agent", "chat_api"]
+PINCODE_PATTERN = re.compile(r"\b\d{6}\b")
+
+
+@dataclass
+class Sample:
+    latency: float
+    first_event: Optional[float]
+    ok: bool
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+
+async def run_load(request: Callable[[int], Awaitable[Sample]], concurrency: int, requests: int) -> dict:
+    """
+    Issue `requests` calls with at most `concurrency` in flight and summarize them.
+
+    Latencies are in milliseconds, throughput in successful requests per second.
+    """
+    samples: List[Sample] = []
+    next_index = iter(range(requests))
+
+    async def worker():
+        for i in next_index:
+            started = time.perf_counter()
+            try:
+                sample = await request(i)
+            except Exception as e:
+                logging.warning(f"Request {i} failed: {e}")
+                sample = Sample(time.perf_counter() - started, None, False)
+            samples.append(sample)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ok = [sample for sample in samples if sample.ok]
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(samples) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "latency_ms": percentiles([sample.latency for sample in ok]),
+        "first_event_ms": percentiles([sample.first_event for sample in ok if sample.first_event is not None]),
+    }
+
+
+def setup_environment(workdir: str, args: argparse.Namespace) -> np.ndarray:
+    """Write the synthetic dataset and point both servers at it. Must run before importing them."""
+    hospitals_path, pincodes_path, pincodes = write_synthetic_dataset(
+        workdir, hospitals=args.hospitals, pincodes=args.pincodes, seed=args.seed
+    )
+    os.environ.update({
+        "HOSPITALS_PATH": hospitals_path,
+        "PINCODES_PATH": pincodes_path,
+        "SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+        "EMBEDDING_PROVIDER": "hash",
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite"),
+        "CHECKPOINT_BACKEND": "memory",
+    })
+    # The vector store lives in ./chroma_langchain_db
+    os.chdir(workdir)
+    return pincodes
+
+
+def index_documents(args: argparse.Namespace) -> None:
+    """Load synthetic chunks into the vector store and build the search indexes, as vectorization.py would."""
+    import mcp_server
+    from embedding_providers import get_embedding_provider, open_vector_store
+    from lexical_index import build_lexical_index
+    from vector_snapshot import export_vector_snapshot
+
+    texts, metadatas, ids = synthetic_documents(args.documents, np.random.default_rng(args.seed))
+    provider = get_embedding_provider()
+    vector_store = open_vector_store(provider, record=True)
+    vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+    build_lexical_index(vector_store, mcp_server.LEXICAL_INDEX_PATH)
+    if args.vector_backend != "chroma":
+        export_vector_snapshot(vector_store, provider, quantize=args.vector_backend == "snapshot-int8")
+
+
+def random_query(rng: np.random.Generator) -> str:
+    return " ".join(rng.choice(HEALTH_TERMS, size=4))
+
+
+def tool_request(pincodes: np.ndarray, rng: np.random.Generator, i: int) -> tuple:
+    """Rotate through the MCP tools with random arguments."""
+    pincode = int(rng.choice(pincodes))
+    if i % 3 == 0:
+        return "find_hospitals", {"pincode": pincode}
+    if i % 3 == 1:
+        return "find_hospitals_by_speciality", {"pincode": pincode, "speciality": "M7"}
+    return "search_documents", {"query": random_query(rng)}
+
+
+def user_message(pincodes: np.ndarray, rng: np.random.Generator) -> str:
+    return f"Which hospital near {int(rng.choice(pincodes))} treats {random_query(rng)}?"
+
+
+def scripted_model(args: argparse.Namespace) -> ScriptedChatModel:
+    # One round with two parallel tool calls, then the answer: the common shape of a real turn
+    return ScriptedChatModel(
+        script=[[
+            ("find_hospitals", lambda text: {"pincode": int(PINCODE_PATTERN.search(text).group())}),
+            ("search_documents", lambda text: {"query": text}),
+        ]],
+        first_token_latency=args.llm_latency,
+        token_latency=args.token_latency,
+    )
+
+
+async def start_chat_server(app) -> tuple:
+    """Serve the chat app on a free local port; the caller installs the agent, so lifespan is off."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+async def run(args: argparse.Namespace, pincodes: np.ndarray) -> Dict[str, List[dict]]:
+    import httpx
+    from fastmcp import Client
+    from langchain_mcp_adapters.tools import load_mcp_tools
+    import mcp_server
+    import chatbot_agent
+    import api_server
+
+    rng = np.random.default_rng(args.seed)
+    results: Dict[str, List[dict]] = {}
+
+    async with Client(mcp_server.mcp) as mcp_client:
+        agent = chatbot_agent.ChatbotAgent(llm=scripted_model(args), tools=await load_mcp_tools(mcp_client.session))
+        await agent.compile_graph()
+        api_server.app.state.chat_agent = agent
+        server, server_task, base_url = await start_chat_server(api_server.app)
+
+        async def mcp_tools_request(i: int) -> Sample:
+            name, arguments = tool_request(pincodes, rng, i)
+            started = time.perf_counter()
+            result = await mcp_client.call_tool(name, arguments, raise_on_error=False)
+            return Sample(time.perf_counter() - started, None, not result.is_error)
+
+        async def agent_request(i: int) -> Sample:
+            started, first_event = time.perf_counter(), None
+            async for _ in agent.stream_graph_updates(str(uuid.uuid4()), user_message(pincodes, rng)):
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+            return Sample(time.perf_counter() - started, first_event, first_event is not None)
+
+        async def chat_api_request(i: int) -> Sample:
+            body = {"thread_id": str(uuid.uuid4()), "user_query": user_message(pincodes, rng)}
+            started, first_event, ok = time.perf_counter(), None, True
+            async with http_client.stream("POST", "/chat", json=body) as response:
+                ok = response.status_code == 200
+                async for line in response.aiter_lines():
+                    if line.startswith("event: error"):
+                        ok = False
+                    if line.startswith("data:") and first_event is None:
+                        first_event = time.perf_counter() - started
+            return Sample(time.perf_counter() - started, first_event, ok and first_event is not None)
+
+        requests = {"mcp_tools": mcp_tools_request, "agent": agent_request, "chat_api": chat_api_request}
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http_client:
+                for scenario in args.scenarios:
+                    # Warm up lazily opened resources (vector store, snapshot pages, connections)
+                    await run_load(requests[scenario], concurrency=1, requests=args.warmup)
+                    results[scenario] = []
+                    for concurrency in args.concurrency:
+                        summary = await run_load(requests[scenario], concurrency, args.requests)
+                        results[scenario].append(summary)
+                        print_summary(scenario, summary)
+        finally:
+            server.should_exit = True
+            await server_task
+            await agent.close()
+    return results
+
+
+def print_summary(scenario: str, summary: dict) -> None:
+    latency, first_event = summary["latency_ms"], summary["first_event_ms"]
+    first_event_text = f"{first_event['p50']}/{first_event['p95']}/{first_event['p99']}" \
+        if first_event["p50"] is not None else "-"
+    print(f"{scenario:<10} c={summary['concurrency']:<4} {summary['throughput_rps']:>8} req/s  "
+          f"latency p50/p95/p99 {latency['p50']}/{latency['p95']}/{latency['p99']} ms  "
+          f"first event {first_event_text} ms  errors {summary['errors']}")
+
+
+def compare(results: Dict[str, List[dict]], baseline: Dict[str, List[dict]], tolerance: float) -> List[str]:
+    """List the scenarios whose p95 latency grew, or whose throughput fell, by more than `tolerance`."""
+    regressions = []
+    for scenario, summaries in results.items():
+        previous = {summary["concurrency"]: summary for summary in baseline.get(scenario, [])}
+        for summary in summaries:
+            before = previous.get(summary["concurrency"])
+            if before is None:
+                continue
+            label = f"{scenario} c={summary['concurrency']}"
+            if summary["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+                regressions.append(f"{label}: p95 {before['latency_ms']['p95']} -> {summary['latency_ms']['p95']} ms")
+            if summary["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{label}: throughput {before['throughput_rps']} -> {summary['throughput_rps']} req/s")
+            if summary["errors"] > before["errors"]:
+                regressions.append(f"{label}: errors {before['errors']} -> {summary['errors']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency benchmarks with local stand-ins for Gemini and the data")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds to the model's first chunk")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Seconds between streamed chunks")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="Seconds per embedding call")
+    parser.add_argument("--hospitals", type=int, default=5000)
+    parser.add_argument("--pincodes", type=int, default=2000)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--vector-backend", choices=["snapshot", "snapshot-int8", "chroma"], default="snapshot",
+                        help="Search documents in the exported vector snapshot or in Chroma")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change before failing")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    with tempfile.TemporaryDirectory(prefix="sevahealth-bench-") as workdir:
+        pincodes = setup_environment(workdir, args)
+
+        from embedding_providers import EmbeddingProvider, register_provider
+
+        register_provider("hash", lambda: EmbeddingProvider(
+            HashEmbeddings(latency_seconds=args.embedding_latency), "hash:256", 256
+        ))
+        index_documents(args)
+        # Per-request info logs would dominate the measurement
+        logging.getLogger().setLevel(logging.WARNING)
+
+        results = asyncio.run(run(args, pincodes))
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults saved to '{output}'")
+
+    if baseline:
+        with open(baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
@@ -0,0 +1,182 @@
+import os
+import math
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Turns run at once per process, and turns allowed to wait for a slot before new ones get a 429
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "32"))
+MAX_QUEUED_CHATS = int(os.getenv("MAX_QUEUED_CHATS", "64"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "10"))
+
+# Retries of a model call that Gemini rejected with 429, with full-jitter exponential backoff
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when the server is saturated; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class Permit:
+    """A held turn slot. Releasing it more than once is harmless."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._started)
+
+
+class AdmissionController:
+    """
+    Limits concurrent agent turns, with a bounded queue in front of the limit.
+
+    A request that finds every slot busy waits for one, up to `queue_timeout`
+    seconds; when `max_queued` requests are already waiting it is rejected at
+    once. Rejections carry a Retry-After estimate from the average turn length.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_CHATS, max_queued: int = MAX_QUEUED_CHATS,
+                 queue_timeout: float = QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.running = 0
+        # Seeded with a typical turn length, then a moving average of real ones
+        self.average_turn_seconds = 10.0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def retry_after(self) -> int:
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, min(60, math.ceil(self.average_turn_seconds * backlog)))
+
+    async def acquire(self) -> Permit:
+        """
+        Wait for a turn slot.
+
+        Raises:
+            AdmissionRejected: If the queue is full or no slot frees up within the queue timeout.
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queued:
+            raise AdmissionRejected(self.retry_after())
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected(self.retry_after())
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return Permit(self)
+
+    def _release(self, seconds: float) -> None:
+        self.running -= 1
+        self.average_turn_seconds = 0.9 * self.average_turn_seconds + 0.1 * seconds
+        self._semaphore.release()
+
+
+class ThreadLocks:
+    """One lock per conversation thread, so turns of the same thread run one after another."""
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, thread_id: str) -> AsyncIterator[None]:
+        lock, users = self._locks.get(thread_id, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._locks[thread_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[thread_id]
+            if users == 1:
+                del self._locks[thread_id]
+            else:
+                self._locks[thread_id] = (lock, users - 1)
+
+
+class Turn:
+    """
+    One agent run whose events are fanned out to every request subscribed to it.
+
+    A subscriber that joins late first receives the events published so far.
+    The run is cancelled once its last subscriber leaves.
+    """
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    def publish(self, event: Any) -> None:
+        self.events.append(event)
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.remove(queue)
+        if not self._subscribers and self.task is not None and not self.task.done():
+            self.task.cancel()
+
+
+class TurnCoalescer:
+    """
+    Runs each distinct turn once while it is in flight.
+
+    A duplicate submission (a retry or double click sending the same message to
+    the same thread) joins the running turn instead of starting a second one.
+    """
+
+    def __init__(self):
+        self._turns: Dict[Hashable, Turn] = {}
+
+    def get(self, key: Hashable) -> Optional[Turn]:
+        return self._turns.get(key)
+
+    def start(self, key: Hashable, run: Callable[[Turn], Awaitable[None]]) -> Turn:
+        turn = Turn()
+        self._turns[key] = turn
+        turn.task = asyncio.create_task(run(turn))
+        # A done callback also fires for a task cancelled before it started running
+        turn.task.add_done_callback(lambda task: self._finish(key, turn))
+        return turn
+
+    def _finish(self, key: Hashable, turn: Turn) -> None:
+        if self._turns.get(key) is turn:
+            del self._turns[key]
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an upstream API error is a rate limit (429) or overload (503) rejection."""
+    if getattr(error, "code", None) in (429, 503) or getattr(error, "status_code", None) in (429, 503):
+        return True
+    text = str(error)
+    return any(marker in text for marker in ("429", "503", "RESOURCE_EXHAUSTED", "UNAVAILABLE")) \
+        or "rate limit" in text.lower()
+
+
+def backoff_delay(attempt: int, base: float = LLM_RETRY_BASE_SECONDS, cap: float = LLM_RETRY_MAX_SECONDS) -> float:
+    """Full-jitter exponential backoff, so retries from many turns don't arrive together."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
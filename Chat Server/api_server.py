@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -7,8 +7,13 @@ from dotenv import load_dotenv
 import os
 import logging
 import chatbot_agent
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import json
+from contextlib import asynccontextmanager
+import asyncio
+import time
+from chat_telemetry import CHAT_REQUESTS, metrics_payload, new_request_id, observe, request_id_var
+from admission import AdmissionController, AdmissionRejected, ThreadLocks, Turn, TurnCoalescer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,7 +22,24 @@ logging.basicConfig(
 
 load_dotenv()
 
-app = FastAPI(title="Chatbot API Server")
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+_STREAM_END = object()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the agent runtime once and share it across all chat requests
+    app.state.chat_agent = chatbot_agent.ChatbotAgent()
+    await app.state.chat_agent.compile_graph()
+    try:
+        yield
+    finally:
+        await app.state.chat_agent.close()
+
+app = FastAPI(title="Chatbot API Server", lifespan=lifespan)
+
+admission = AdmissionController()
+thread_locks = ThreadLocks()
+turns = TurnCoalescer()
 
 # Add CORS middleware
 app.add_middleware(
@@ -32,21 +54,102 @@ class ChatRequest(BaseModel):
     thread_id: str
     user_query: str
 
+@app.get("/metrics")
+async def metrics():
+    payload, content_type = metrics_payload()
+    return Response(payload, media_type=content_type)
+
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     try:
-        logging.info(f"Received chat request for thread_id: {request.thread_id}")
+        started = time.perf_counter()
+        request_id = new_request_id(http_request.headers.get("x-request-id"))
+        logging.debug("Received chat request %s for thread_id: %s", request_id, request.thread_id)
 
-        chat_agent = chatbot_agent.ChatbotAgent(request.thread_id)
-        graph = await chat_agent.compile_graph()
+        chat_agent = app.state.chat_agent
+        turn_key = (request.thread_id, request.user_query)
+
+        # A duplicate submission joins the turn already running for it; anything
+        # else needs a turn slot, or is turned away when the server is saturated
+        turn = turns.get(turn_key)
+        if turn is None:
+            try:
+                permit = await admission.acquire()
+            except AdmissionRejected as e:
+                CHAT_REQUESTS.labels("rejected").inc()
+                return JSONResponse({"detail": str(e)}, status_code=429,
+                                    headers={"Retry-After": str(e.retry_after)})
+            observe("admission_wait", time.perf_counter() - started)
+            turn = turns.get(turn_key)
+            if turn is not None:
+                permit.release()
+
+        if turn is None:
+            async def run(turn: Turn):
+                try:
+                    # One turn per thread at a time, so turns never race on the same history
+                    async with thread_locks.hold(request.thread_id):
+                        async for event in chat_agent.stream_graph_updates(
+                            thread_id=request.thread_id, user_input=request.user_query
+                        ):
+                            turn.publish(event)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"Error streaming chat response: {e}")
+                    turn.publish({"error": "Internal Server Error"})
+                finally:
+                    turn.publish(_STREAM_END)
+
+            # The agent runs in its own task, so heartbeats can be sent while the model or a
+            # tool is still working. The task inherits the request id, which tags its spans.
+            request_id_var.set(request_id)
+            turn = turns.start(turn_key, run)
+            turn.task.add_done_callback(lambda task: permit.release())
+        else:
+            logging.debug("Joining the turn in flight for thread_id: %s", request.thread_id)
+
+        queue = turn.subscribe()
 
         async def event_stream():
-            async for event in chat_agent.stream_graph_updates(user_input=request.user_query):
-                message = event.get("custom_output")
-                print(message)
-                yield f"data: {json.dumps({'message': message})}\n\n"
-        
-        return StreamingResponse(event_stream())
+            first_event = True
+            status = "ok"
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        if await http_request.is_disconnected():
+                            logging.debug("Client disconnected from thread_id: %s", request.thread_id)
+                            status = "disconnected"
+                            break
+                        yield ": heartbeat\n\n"
+                        continue
+                    if event is _STREAM_END:
+                        break
+                    if first_event:
+                        observe("chat_first_event", time.perf_counter() - started)
+                        first_event = False
+                    if "error" in event:
+                        status = "error"
+                        yield f"event: error\ndata: {json.dumps(event)}\n\n"
+                        continue
+                    message = event.get("custom_output")
+                    yield f"data: {json.dumps({'message': message})}\n\n"
+            except (asyncio.CancelledError, GeneratorExit):
+                status = "disconnected"
+                raise
+            finally:
+                # The turn is cancelled once no client is listening to it any more
+                turn.unsubscribe(queue)
+                observe("chat_request", time.perf_counter() - started, status)
+                CHAT_REQUESTS.labels(status).inc()
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-ID": request_id},
+        )
     
     except Exception as e:
         logging.error(f"Error processing chat request: {e}")
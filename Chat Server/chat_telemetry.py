@@ -0,0 +1,45 @@
+import os
+import sys
+import uuid
+from typing import Optional
+
+from prometheus_client import Counter
+
+# The stage timing shared with the MCP server lives in ../Shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Shared"))
+from stage_telemetry import StageTelemetry, metrics_payload, request_id_var
+
+# From sub-millisecond lookups up to slow model turns
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGES = StageTelemetry("chat", "chat server", STAGE_BUCKETS)
+observe, span = STAGES.observe, STAGES.span
+
+CHAT_REQUESTS = Counter("sevahealth_chat_requests_total", "Chat requests by outcome", ["status"])
+UPSTREAM_RATE_LIMITS = Counter("sevahealth_chat_upstream_rate_limited_total", "Model calls rejected with a 429")
+
+
+def new_request_id(header_value: Optional[str] = None) -> str:
+    """Use the caller's X-Request-ID if it sent one, otherwise create an id."""
+    return header_value[:64] if header_value else uuid.uuid4().hex
+
+
+class RequestIdSession:
+    """
+    Wraps an MCP ClientSession so each tool call carries the current request id.
+
+    The id travels in the `_meta` field of the tools/call request, where the MCP
+    server's telemetry middleware picks it up to tag its own spans.
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def call_tool(self, name, arguments=None, *args, **kwargs):
+        request_id = request_id_var.get()
+        if request_id is not None:
+            kwargs["meta"] = {**(kwargs.get("meta") or {}), "request_id": request_id}
+        return await self._session.call_tool(name, arguments, *args, **kwargs)
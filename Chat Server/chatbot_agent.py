@@ -1,15 +1,24 @@
 from fastapi import responses
 from langgraph.graph import StateGraph, START, END, MessagesState
-from langgraph.checkpoint.memory import InMemorySaver
 import os
 from dotenv import load_dotenv
 import logging
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph.state import CompiledStateGraph
-from typing import Any, AsyncGenerator
-from langchain_core.messages import message_to_dict
+from typing import Any, AsyncGenerator, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.tools import BaseTool
+from langchain_core.messages import message_to_dict, message_chunk_to_message, AIMessage, ToolMessage
 from langgraph.config import get_stream_writer
+from langchain_mcp_adapters.tools import load_mcp_tools
+from contextlib import AsyncExitStack
+from checkpointers import open_checkpointer, trim_thread_messages
+from context_window import ContextWindow, estimate_tokens
+from chat_telemetry import UPSTREAM_RATE_LIMITS, RequestIdSession, observe, span
+from admission import LLM_RATE_LIMIT_RETRIES, backoff_delay, is_rate_limited
+import asyncio
+import time
 
 
 load_dotenv()
@@ -18,14 +27,88 @@ logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(name)s - %(leveln
 logger = logging.getLogger(__name__)
 
 MCP_SERVER_URL = os.getenv("MCP_SEVER_URL","http://localhost:8000/mcp")
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+MAX_AGENT_ITERATIONS = int(os.getenv("MAX_AGENT_ITERATIONS", "5"))
+
+SYSTEM_PROMPT = """
+You are a helpful assistant that helps users by answering their questions
+about health and nearby hospitals.
+
+To guide them to a speciality hospital first get the list of specialities
+If the user is looking for a hospital ask their pincode to find the nearest hospitals.
+If they need a particular speciality, find hospitals by speciality with its code from the list below.
+
+If the user wants in a specific language respond in that language.
+
+The answer should be to the audience of rural India specifically Maharashtra.
+
+You can use the tools provided to you to get information about hospitals and specialities.
+You can also use tool for searching relevant information by passing the query. It shall perform semantic search
+over a knowledge base of health related articles and return the most relevant information.
+
+If you don't know the answer to a question, you can use the search document tool to find the answer.
+
+The Speciality:
+S1 General Surgery
+S5 Orthopedic Surgery And Procedures
+M3 Critical Care
+S14 Polytrauma
+M16 General Medicine
+S9 Urology
+M10 Pulmonology
+M8 Nephrology
+S4 Gynaecology And Obstetrics Surgery
+M6 Neonatal and Pediatric Medical Management
+M5 Infectious diseases
+M14 Medical Gastroenterology
+S10 Neurosurgery
+M7 Cardiology
+S8 Pediatric Surgery
+S11 Surgical Oncology
+M9 Neurology
+M13 Endocrinology
+S12 Plastic Surgery
+S2 ENT
+S6 Surgical Gastroenterology
+S20 Maxillofacial Surgery
+M1 Medical Oncology
+M18 Haematology
+M19 Haemato Oncology
+S13 Burns
+S3 Ophthalmology Surgery
+M11 Dermatology
+S15 Prosthesis and Orthosis
+M12 Rheumatology
+S7 Cardiac And Cardiothoracic Surgery
+M15 Interventional Radiology
+M20 Physiotherapy
+S21 Pediatric Cancer
+M17 Mental Health Packages
+M2 Radiation Oncology
+S16 Maxillofacial Surgery
+"""
 
 class ChatbotAgent:
-    def __init__(self, thread_id: str):
-        self.thread_id = thread_id
-        self.config = {"configurable": {"thread_id": thread_id}}
-        logger.info(f"Initializing ChatbotAgent with config: {self.config}")
+    """
+    Long-lived agent runtime. The LLM client, MCP session, tool bindings and compiled
+    graph are built once by `compile_graph` and shared by every conversation thread.
+
+    Args:
+        llm: Chat model to use instead of Gemini, e.g. a local stand-in for benchmarks.
+        tools: Tools to use instead of connecting to the MCP server.
+    """
+    def __init__(self, llm: Optional[BaseChatModel] = None, tools: Optional[List[BaseTool]] = None):
+        self._exit_stack = AsyncExitStack()
+        self.llm = llm
+        self.tools = tools
+        self.context_window = ContextWindow(SYSTEM_PROMPT.strip())
+        logger.info("Initializing ChatbotAgent")
 
     async def _connect_to_mcp(self) -> None:
+        if self.tools is not None:
+            self.tools_by_name = {tool.name: tool for tool in self.tools}
+            logger.info(f"Using {len(self.tools)} provided tools.")
+            return
         try:
             logger.info("Connecting to MCP server...")
             self.client = MultiServerMCPClient({
@@ -34,7 +117,13 @@ class ChatbotAgent:
                     "transport" : "streamable_http"
                 }
             })
-            self.tools = await self.client.get_tools()
+            # Keep a single MCP session open for the lifetime of the agent so tool calls
+            # reuse the same HTTP connection instead of reconnecting on every call
+            session = await self._exit_stack.enter_async_context(
+                self.client.session("sevaHealthMCP")
+            )
+            self.tools = await load_mcp_tools(RequestIdSession(session))
+            self.tools_by_name = {tool.name: tool for tool in self.tools}
             logger.info(f"Connected to MCP server and retrieved {len(self.tools)} tools.")
         except Exception as e:
             logger.error(f"Failed to connect to MCP server: {e}")
@@ -43,18 +132,22 @@ class ChatbotAgent:
     async def _setup_checkpointer(self) -> None:
         try:
             logger.info("Setting up checkpointing...")
-            self.checkpointer = InMemorySaver()
+            self.checkpointer = await open_checkpointer(self._exit_stack)
         except Exception as e:
             logger.error(f"Failed to set up checkpointing: {e}")
             raise
 
     async def _setup_llm(self) -> None:
+        if self.llm is not None:
+            return
         try:
             logger.info("Setting up LLM...")
             self.llm = ChatGoogleGenerativeAI(
                 model="gemini-2.5-flash", 
                 temperature=0,
-                google_api_key=os.getenv("GOOGLE_API_KEY")
+                google_api_key=os.getenv("GOOGLE_API_KEY"),
+                # Rate limits are retried by _stream_model with jitter, and only before any output
+                max_retries=1,
             )
         except Exception as e:
             logger.error(f"Failed to set up LLM: {e}")
@@ -62,9 +155,13 @@ class ChatbotAgent:
 
     async def compile_graph(self) -> CompiledStateGraph:
         try:
-            await self._connect_to_mcp()
-            await self._setup_checkpointer()
-            await self._setup_llm()
+            with span("agent_setup"):
+                await self._connect_to_mcp()
+                await self._setup_checkpointer()
+                await self._setup_llm()
+            self.model_with_tools = self.llm.bind_tools(self.tools)
+            # Used once the tool-call budget is spent, so the model has to answer
+            self.model_without_tool_calls = self.llm.bind_tools(self.tools, tool_choice="none")
 
             logger.info("Compiling state graph...")
 
@@ -83,73 +180,25 @@ class ChatbotAgent:
             
         except Exception as e:
             logger.error(f"Failed to compile state graph: {e}")
+            await self.close()
             raise
+
+    async def close(self) -> None:
+        logger.info("Closing MCP session...")
+        await self._exit_stack.aclose()
     
     async def chatbot_node(self, state: MessagesState) -> MessagesState:
         writer = get_stream_writer()
         try:
-            messages = state["messages"]
-            messages += [{"role" : "system", "content": """
-                You are a helpful assistant that helps users by answering their questions
-                about health and nearby hospitals.
-                          
-                To guide them to a speciality hospital first get the list of specialities
-                If the user is looking for a hospital ask their pincode to find the nearest hospitals.
-                          
-                If the user wants in a specific language respond in that language.
-
-                The answer should be to the audience of rural India specifically Maharashtra.
-                          
-                You can use the tools provided to you to get information about hospitals and specialities.
-                You can also use tool for searching relevant information by passing the query. It shall perform semantic search
-                over a knowledge base of health related articles and return the most relevant information.
-                          
-                If you don't know the answer to a question, you can use the search document tool to find the answer.
-                          
-                The Speciality:
-                          S1 General Surgery
-                            S5 Orthopedic Surgery And Procedures            
-                            M3 Critical Care                                
-                            S14 Polytrauma                                  
-                            M16 General Medicine                            
-                            S9 Urology                                      
-                            M10 Pulmonology                                 
-                            M8 Nephrology                                   
-                            S4 Gynaecology And Obstetrics Surgery           
-                            M6 Neonatal and Pediatric Medical Management    
-                            M5 Infectious diseases                          
-                            M14 Medical Gastroenterology                    
-                            S10 Neurosurgery                                
-                            M7 Cardiology                                   
-                            S8 Pediatric Surgery                            
-                            S11 Surgical Oncology                           
-                            M9 Neurology                                    
-                            M13 Endocrinology                               
-                            S12 Plastic Surgery                             
-                            S2 ENT                                          
-                            S6 Surgical Gastroenterology                    
-                            S20 Maxillofacial Surgery                       
-                            M1 Medical Oncology                             
-                            M18 Haematology                                 
-                            M19 Haemato Oncology                            
-                            S13 Burns                                       
-                            S3 Ophthalmology Surgery                        
-                            M11 Dermatology                                 
-                            S15 Prosthesis and Orthosis                     
-                            M12 Rheumatology                                
-                            S7 Cardiac And Cardiothoracic Surgery           
-                            M15 Interventional Radiology                    
-                            M20 Physiotherapy                               
-                            S21 Pediatric Cancer                            
-                            M17 Mental Health Packages                      
-                            M2 Radiation Oncology                           
-                            S16 Maxillofacial Surgery                       
-            """}]
+            history = state["messages"]
+            context, context_tokens = self.context_window.build(history)
+            tokens_sent = 0
 
             responses = []
-            model_with_tools = self.llm.bind_tools(self.tools)
-            while True:
-                response = await model_with_tools.ainvoke(messages + responses)
+            for iteration in range(MAX_AGENT_ITERATIONS + 1):
+                model = self.model_with_tools if iteration < MAX_AGENT_ITERATIONS else self.model_without_tool_calls
+                tokens_sent += context_tokens + sum(estimate_tokens(message) for message in responses)
+                response = await self._stream_model(model, context + responses, writer)
                 responses.append(response)
                 writer({
                     "custom_output" : {
@@ -158,38 +207,117 @@ class ChatbotAgent:
                     }
                 })
 
-                if response.tool_calls:
-                    for tool_call in response.tool_calls:
-                        tool = next((t for t in self.tools if t.name == tool_call.get("name")), None)
-                        if tool:
-                            tool_call_params = {
-                                "type": "tool_call",
-                                "id": tool_call.get("id"),
-                                "args": tool_call.get("args"),
-                            }
-                            tool_response = await tool.ainvoke(tool_call_params)
-                            responses.append(tool_response)
-                            writer({
-                                "custom_output" : {
-                                    "node" : "tool_call",
-                                    "message" : message_to_dict(tool_response)
-                                }
-                            })
-                else:
+                if not response.tool_calls:
                     break
-            return {"messages": responses}
+
+                # Tool calls from one model turn are independent, so run them concurrently.
+                # If the turn is cancelled, gather cancels the pending tool calls too.
+                tool_responses = await asyncio.gather(
+                    *(self._run_tool(tool_call) for tool_call in response.tool_calls)
+                )
+                for tool_response in tool_responses:
+                    responses.append(tool_response)
+                    writer({
+                        "custom_output" : {
+                            "node" : "tool_call",
+                            "message" : message_to_dict(tool_response)
+                        }
+                    })
+
+            reported_tokens = sum(
+                (message.usage_metadata or {}).get("input_tokens", 0)
+                for message in responses if isinstance(message, AIMessage)
+            )
+            logger.debug("Turn sent ~%d prompt tokens (%d reported by the model), %d of %d history messages in context",
+                         tokens_sent, reported_tokens, len(context) - 1, len(history))
+            # Large tool results were needed for this turn's answer but are truncated before
+            # they are stored, so they don't inflate every later turn of the thread
+            compacted = [self.context_window.compact(message) for message in responses]
+            return {"messages": trim_thread_messages(history) + compacted}
         except Exception as e:
             logger.error(f"Error in chatbot_node: {e}")
             raise
         
     
-    async def stream_graph_updates(self, user_input: str) -> AsyncGenerator[Any,None]:
-        logger.info(f"Streaming graph updates for user input: {user_input}")
+    async def _stream_model(self, model, messages, writer):
+        """
+        Stream a model response, emitting each text delta as a `chatbot_token` event.
+
+        A call rejected by the API's rate limit is retried with jittered backoff, as
+        long as nothing of it has been streamed to the client yet.
+
+        Returns:
+            The consolidated AIMessage, including any tool calls. Empty if the model streamed nothing.
+        """
+        for attempt in range(LLM_RATE_LIMIT_RETRIES + 1):
+            gathered = None
+            emitted = False
+            started = time.perf_counter()
+            try:
+                with span("llm_call"):
+                    async for chunk in model.astream(messages):
+                        if gathered is None:
+                            observe("llm_first_chunk", time.perf_counter() - started)
+                        gathered = chunk if gathered is None else gathered + chunk
+                        if isinstance(chunk.content, str):
+                            text = chunk.content
+                        else:
+                            text = "".join(part.get("text", "") for part in chunk.content
+                                           if isinstance(part, dict) and part.get("type") == "text")
+                        if text:
+                            emitted = True
+                            writer({
+                                "custom_output" : {
+                                    "node" : "chatbot_token",
+                                    "message" : {"content": text}
+                                }
+                            })
+                if gathered is None:
+                    # The API can end a stream without any chunk, e.g. for a blocked response
+                    logger.warning("Model stream ended without any chunk")
+                    return AIMessage(content="")
+                return message_chunk_to_message(gathered)
+            except Exception as e:
+                if emitted or attempt == LLM_RATE_LIMIT_RETRIES or not is_rate_limited(e):
+                    raise
+                UPSTREAM_RATE_LIMITS.inc()
+                delay = backoff_delay(attempt)
+                logger.warning(f"Model call rate limited, retrying in {delay:.1f}s ({attempt + 1}/{LLM_RATE_LIMIT_RETRIES})")
+                await asyncio.sleep(delay)
+
+    async def _run_tool(self, tool_call: dict) -> ToolMessage:
+        name = tool_call.get("name")
+        tool = self.tools_by_name.get(name)
+        if tool is None:
+            logger.error(f"Model requested unknown tool: {name}")
+            return ToolMessage(content=f"Unknown tool: {name}", name=name,
+                               tool_call_id=tool_call.get("id"), status="error")
+
+        tool_call_params = {
+            "type": "tool_call",
+            "id": tool_call.get("id"),
+            "name": name,
+            "args": tool_call.get("args"),
+        }
+        try:
+            with span(f"mcp_tool:{name}"):
+                return await asyncio.wait_for(tool.ainvoke(tool_call_params), timeout=TOOL_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error(f"Tool {name} timed out after {TOOL_TIMEOUT_SECONDS}s")
+            return ToolMessage(content=f"Tool {name} timed out", name=name,
+                               tool_call_id=tool_call.get("id"), status="error")
+        except Exception as e:
+            logger.error(f"Tool {name} failed: {e}")
+            return ToolMessage(content=f"Tool {name} failed: {e}", name=name,
+                               tool_call_id=tool_call.get("id"), status="error")
+
+    async def stream_graph_updates(self, thread_id: str, user_input: str) -> AsyncGenerator[Any,None]:
+        logger.debug("Streaming graph updates for thread %s", thread_id)
+        config = {"configurable": {"thread_id": thread_id}}
         async for event in self.graph.astream(
             {"messages": [{"role": "user", "content": user_input}]},
-            config=self.config,
+            config=config,
             stream_mode="custom"):
-            print(event)
             yield event
 
 if __name__ == "__main__":
@@ -199,15 +327,18 @@ if __name__ == "__main__":
 
     async def main():
         thread_id = str(uuid.uuid4())
-        agent = ChatbotAgent(thread_id)
+        agent = ChatbotAgent()
         await agent.compile_graph()
-        while True:
-            user_input = input("User: ")
-            if user_input.lower() in ["exit", "quit"]:
-                logger.info("Exiting chat...")
-                break
-        
-            async for event in agent.stream_graph_updates(user_input):
-                logger.info(event.get("custom_output"))
+        try:
+            while True:
+                user_input = input("User: ")
+                if user_input.lower() in ["exit", "quit"]:
+                    logger.info("Exiting chat...")
+                    break
+
+                async for event in agent.stream_graph_updates(thread_id, user_input):
+                    logger.info(event.get("custom_output"))
+        finally:
+            await agent.close()
 
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", "86400"))
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+MAX_THREAD_MESSAGES = int(os.getenv("MAX_THREAD_MESSAGES", "100"))
+
+
+class LRUMemorySaver(InMemorySaver):
+    """
+    In-memory checkpointer that bounds the number of conversation threads it keeps.
+
+    Threads idle for longer than `ttl_seconds` are dropped, and once more than
+    `max_threads` are stored the least recently used ones are evicted. Each thread
+    keeps only its latest checkpoint, so its memory is bounded by the size of its
+    state rather than by the number of turns.
+    """
+
+    def __init__(self, max_threads: int = CHECKPOINT_MAX_THREADS,
+                 ttl_seconds: float = CHECKPOINT_TTL_SECONDS, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._last_access: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        # (channel, version) pairs stored in `blobs` per (thread_id, checkpoint_ns)
+        self._blob_versions: Dict[Tuple[str, str], Set[Tuple[str, Any]]] = {}
+
+    def _touch(self, config) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        now = time.monotonic()
+        with self._lock:
+            self._last_access[thread_id] = now
+            self._last_access.move_to_end(thread_id)
+            expired = []
+            for candidate, last_access in self._last_access.items():
+                if now - last_access <= self.ttl_seconds and len(self._last_access) - len(expired) <= self.max_threads:
+                    break
+                expired.append(candidate)
+            for candidate in expired:
+                del self._last_access[candidate]
+        for candidate in expired:
+            logger.info(f"Evicting checkpoints for thread_id: {candidate}")
+            self._delete_storage(candidate)
+
+    def _drop_superseded(self, config, checkpoint, new_versions) -> None:
+        """Delete the thread's earlier checkpoints, their writes and the channel values only they referenced."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [checkpoint_id for checkpoint_id in checkpoints if checkpoint_id < checkpoint["id"]]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        current = checkpoint["channel_versions"]
+        versions = self._blob_versions.setdefault((thread_id, checkpoint_ns), set())
+        versions.update(new_versions.items())
+        for channel, version in [item for item in versions if current.get(item[0]) != item[1]]:
+            versions.discard((channel, version))
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+
+    def _delete_storage(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for key in [key for key in self._blob_versions if key[0] == thread_id]:
+            del self._blob_versions[key]
+
+    def get_tuple(self, config):
+        checkpoint_tuple = super().get_tuple(config)
+        if checkpoint_tuple is not None:
+            self._touch(config)
+        return checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._drop_superseded(config, checkpoint, new_versions)
+        self._touch(config)
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_access.pop(thread_id, None)
+        self._delete_storage(thread_id)
+
+
+async def _open_sqlite_saver(stack: AsyncExitStack, db_path: str, **kwargs: Any) -> BaseCheckpointSaver:
+    import aiosqlite
+    from sqlite_checkpointer import PrunedSqliteSaver
+
+    conn = await aiosqlite.connect(db_path)
+    stack.push_async_callback(conn.close)
+    # WAL lets several uvicorn workers read while one of them writes; the busy timeout
+    # makes concurrent writers wait for the lock instead of failing immediately.
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute("PRAGMA synchronous=NORMAL")
+    await conn.execute("PRAGMA busy_timeout=5000")
+    saver = PrunedSqliteSaver(conn, **kwargs)
+    await saver.setup()
+    await saver.prune()
+    return saver
+
+
+async def open_checkpointer(stack: AsyncExitStack, backend: Optional[str] = None) -> BaseCheckpointSaver:
+    """
+    Create the checkpoint backend selected by `CHECKPOINT_BACKEND`.
+
+    Args:
+        stack: Exit stack that owns any connections opened for the backend.
+        backend: "memory" for a per-process LRU store, "sqlite" for a WAL-mode
+            database shared by all workers on the host.
+    """
+    backend = backend or CHECKPOINT_BACKEND
+    if backend == "memory":
+        return LRUMemorySaver()
+    if backend == "sqlite":
+        logger.info(f"Using SQLite checkpoints at {CHECKPOINT_DB_PATH}")
+        return await _open_sqlite_saver(stack, CHECKPOINT_DB_PATH)
+    raise ValueError(f"Unknown checkpoint backend: {backend}")
+
+
+def trim_thread_messages(messages: Sequence[AnyMessage],
+                         max_messages: int = MAX_THREAD_MESSAGES) -> List[RemoveMessage]:
+    """
+    Build the removals that cap a thread's stored history at `max_messages`.
+
+    The oldest messages are dropped, and the cut is moved forward to the next user
+    message so the remaining history never starts with an orphaned tool result.
+    """
+    overflow = len(messages) - max_messages
+    if overflow <= 0:
+        return []
+    cut = overflow
+    while cut < len(messages) and not isinstance(messages[cut], HumanMessage):
+        cut += 1
+    return [RemoveMessage(id=message.id) for message in messages[:cut] if message.id]
@@ -0,0 +1,83 @@
+import os
+import json
+from typing import List, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage, ToolMessage
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+MAX_TOOL_MESSAGE_CHARS = int(os.getenv("MAX_TOOL_MESSAGE_CHARS", "4000"))
+# Rough size of a Gemini token for mixed English and Devanagari text, good enough for budgeting
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def message_text(message: AnyMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in message.content
+    )
+
+
+def estimate_tokens(message: AnyMessage) -> int:
+    chars = len(message_text(message))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        chars += sum(len(json.dumps(tool_call.get("args", {}))) for tool_call in message.tool_calls)
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """
+    Builds the prompt sent to the model for each turn.
+
+    The system prompt is always a single message at the head, the oldest turns are
+    dropped once the history exceeds `token_budget`, and large tool results are
+    truncated before they are stored in the thread history.
+    """
+
+    def __init__(self, system_prompt: str, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 max_tool_chars: int = MAX_TOOL_MESSAGE_CHARS):
+        self.system_message = SystemMessage(content=system_prompt)
+        self.token_budget = token_budget
+        self.max_tool_chars = max_tool_chars
+
+    def compact(self, message: AnyMessage) -> AnyMessage:
+        """Truncate a tool result that is too large to keep in the thread history."""
+        if not isinstance(message, ToolMessage):
+            return message
+        text = message_text(message)
+        if len(text) <= self.max_tool_chars:
+            return message
+        truncated = f"{text[:self.max_tool_chars]}\n...[truncated {len(text) - self.max_tool_chars} characters]"
+        return message.model_copy(update={"content": truncated})
+
+    def build(self, history: Sequence[AnyMessage]) -> Tuple[List[AnyMessage], int]:
+        """
+        Select the messages to send for a turn.
+
+        Returns:
+            (messages, estimated_tokens): the system message followed by the newest
+            turns that fit in the budget. The latest turn is always included.
+        """
+        messages = [self.compact(message) for message in history if not isinstance(message, SystemMessage)]
+
+        # Split into turns that each start with a user message, so tool calls and
+        # their results are never separated
+        turns: List[List[AnyMessage]] = []
+        for message in messages:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([])
+            turns[-1].append(message)
+
+        tokens = estimate_tokens(self.system_message)
+        kept: List[List[AnyMessage]] = []
+        for turn in reversed(turns):
+            turn_tokens = sum(estimate_tokens(message) for message in turn)
+            if kept and tokens + turn_tokens > self.token_budget:
+                break
+            kept.append(turn)
+            tokens += turn_tokens
+
+        selected = [message for turn in reversed(kept) for message in turn]
+        return [self.system_message] + selected, tokens
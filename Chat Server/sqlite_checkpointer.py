@@ -0,0 +1,86 @@
+import time
+import logging
+from typing import Any
+
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from checkpointers import CHECKPOINT_MAX_THREADS, CHECKPOINT_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Idle and surplus threads are dropped every PRUNE_EVERY_PUTS checkpoints
+PRUNE_EVERY_PUTS = 100
+
+
+class PrunedSqliteSaver(AsyncSqliteSaver):
+    """
+    SQLite checkpointer with the same bounds as LRUMemorySaver.
+
+    Each thread keeps only its latest checkpoint and that checkpoint's writes.
+    Every `PRUNE_EVERY_PUTS` checkpoints, threads idle for longer than
+    `ttl_seconds` are deleted, and then the least recently updated threads
+    beyond `max_threads`.
+    """
+
+    def __init__(self, conn, max_threads: int = CHECKPOINT_MAX_THREADS,
+                 ttl_seconds: float = CHECKPOINT_TTL_SECONDS, **kwargs: Any):
+        super().__init__(conn, **kwargs)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._puts = 0
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated REAL NOT NULL)"
+            )
+            await self.conn.execute("CREATE INDEX IF NOT EXISTS thread_activity_updated ON thread_activity (updated)")
+            # Threads stored before the table existed count as active now
+            await self.conn.execute(
+                "INSERT OR IGNORE INTO thread_activity SELECT DISTINCT thread_id, ? FROM checkpoints",
+                (time.time(),),
+            )
+            await self.conn.commit()
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        key = (str(config["configurable"]["thread_id"]), config["configurable"]["checkpoint_ns"], checkpoint["id"])
+        async with self.lock:
+            # Checkpoint ids sort by time, so a newer checkpoint from another worker is kept
+            await self.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", key
+            )
+            await self.conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?", key
+            )
+            await self.conn.execute("INSERT OR REPLACE INTO thread_activity VALUES (?, ?)", (key[0], time.time()))
+            await self.conn.commit()
+        self._puts += 1
+        if self._puts % PRUNE_EVERY_PUTS == 0:
+            await self.prune()
+        return next_config
+
+    async def prune(self) -> None:
+        """Delete threads idle for longer than `ttl_seconds`, then the oldest beyond `max_threads`."""
+        await self.setup()
+        async with self.lock:
+            async with self.conn.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated < ? UNION "
+                "SELECT thread_id FROM (SELECT thread_id FROM thread_activity ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (time.time() - self.ttl_seconds, self.max_threads),
+            ) as cursor:
+                expired = [(row[0],) for row in await cursor.fetchall()]
+            for table in ("checkpoints", "writes", "thread_activity"):
+                await self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", expired)
+            await self.conn.commit()
+        if expired:
+            logger.info(f"Evicted checkpoints for {len(expired)} threads")
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
@@ -0,0 +1,107 @@
+import asyncio
+from contextlib import AsyncExitStack
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from checkpointers import LRUMemorySaver, _open_sqlite_saver, trim_thread_messages
+
+MAX_MESSAGES = 6
+TURNS = 110
+
+
+def build_graph(checkpointer):
+    """A one-node chat graph that stores its history the way ChatbotAgent does."""
+    def chatbot(state: MessagesState):
+        history = state["messages"]
+        reply = AIMessage(content=f"answer {len(history)} " + "x" * 500)
+        return {"messages": trim_thread_messages(history, MAX_MESSAGES) + [reply]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("chatbot", chatbot)
+    builder.add_edge(START, "chatbot")
+    builder.add_edge("chatbot", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+async def chat(graph, thread_id: str, turns: int, on_turn=None) -> None:
+    config = {"configurable": {"thread_id": thread_id}}
+    for turn in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(content=f"question {turn}")]}, config)
+        if on_turn is not None:
+            await on_turn(turn)
+
+
+def assert_bounded(sizes):
+    """Past the message cap, each turn leaves as many rows and (give or take digits) bytes as the last."""
+    (middle_counts, middle_bytes), (last_counts, last_bytes) = sizes[TURNS // 2], sizes[-1]
+    assert last_counts == middle_counts
+    assert last_bytes <= 1.05 * middle_bytes
+
+
+def test_memory_saver_keeps_only_the_latest_checkpoint():
+    saver = LRUMemorySaver()
+    graph = build_graph(saver)
+    sizes = []
+
+    async def measure(turn):
+        blob_bytes = sum(len(blob[1]) for blob in saver.blobs.values())
+        sizes.append(((len(saver.storage["t"][""]), len(saver.writes), len(saver.blobs)), blob_bytes))
+
+    asyncio.run(chat(graph, "t", TURNS, measure))
+
+    assert sizes[-1][0][0] == 1
+    assert_bounded(sizes)
+    state = graph.get_state({"configurable": {"thread_id": "t"}})
+    assert len(state.values["messages"]) <= MAX_MESSAGES + 2
+    assert state.values["messages"][-1].content.startswith("answer")
+
+
+def test_sqlite_saver_keeps_only_the_latest_checkpoint(tmp_path):
+    async def run():
+        async with AsyncExitStack() as stack:
+            saver = await _open_sqlite_saver(stack, str(tmp_path / "checkpoints.sqlite"))
+            graph = build_graph(saver)
+            sizes = []
+
+            async def measure(turn):
+                async with saver.conn.execute(
+                    "SELECT COUNT(*), (SELECT COUNT(*) FROM writes), SUM(LENGTH(checkpoint)) FROM checkpoints"
+                ) as cursor:
+                    checkpoints, writes, checkpoint_bytes = await cursor.fetchone()
+                sizes.append(((checkpoints, writes), checkpoint_bytes))
+
+            await chat(graph, "t", TURNS, measure)
+            state = await graph.aget_state({"configurable": {"thread_id": "t"}})
+            return sizes, state
+
+    sizes, state = asyncio.run(run())
+
+    assert sizes[-1][0][0] == 1
+    assert_bounded(sizes)
+    assert state.values["messages"][-1].content.startswith("answer")
+
+
+def test_sqlite_saver_prunes_idle_and_surplus_threads(tmp_path):
+    async def threads(saver):
+        async with saver.conn.execute("SELECT DISTINCT thread_id FROM checkpoints ORDER BY thread_id") as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def run():
+        async with AsyncExitStack() as stack:
+            saver = await _open_sqlite_saver(stack, str(tmp_path / "checkpoints.sqlite"),
+                                             max_threads=3, ttl_seconds=3600)
+            graph = build_graph(saver)
+            for thread_id in ["a", "b", "c", "d", "e"]:
+                await chat(graph, thread_id, 2)
+            await saver.prune()
+            surplus_pruned = await threads(saver)
+
+            saver.ttl_seconds = 0
+            await saver.prune()
+            return surplus_pruned, await threads(saver)
+
+    surplus_pruned, ttl_pruned = asyncio.run(run())
+
+    assert surplus_pruned == ["c", "d", "e"]
+    assert ttl_pruned == []
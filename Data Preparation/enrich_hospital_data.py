@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Protocol, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Quality flags recorded per hospital in the `geo_quality` column
+PINCODE_CENTROID = 'pincode_centroid'
+GEOCODED = 'geocoded'
+UNRESOLVED = 'unresolved'
+
+Coordinates = Tuple[float, float]
+
+
+class Geocoder(Protocol):
+    def geocode(self, query: str) -> Optional[Coordinates]:
+        ...
+
+
+class NominatimGeocoder:
+    """OpenStreetMap geocoding through geopy."""
+
+    def __init__(self, user_agent: str = 'sevahealth-ai-enrichment', timeout: float = 10):
+        from geopy.geocoders import Nominatim
+
+        self.client = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(self, query: str) -> Optional[Coordinates]:
+        location = self.client.geocode(query, country_codes='in')
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class StubGeocoder:
+    """Offline geocoder answering from a fixed mapping of normalized address to coordinates."""
+
+    def __init__(self, mapping: Dict[str, Coordinates]):
+        self.mapping = {normalize_address(query): tuple(coords) for query, coords in mapping.items()}
+        self.calls = 0
+
+    @classmethod
+    def from_json(cls, path: str) -> 'StubGeocoder':
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def geocode(self, query: str) -> Optional[Coordinates]:
+        self.calls += 1
+        return self.mapping.get(normalize_address(query))
+
+
+class RateLimiter:
+    """Spaces calls at least 1 / rate seconds apart across all worker threads."""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class GeocodeCache:
+    """
+    Persistent cache of geocoding results keyed by normalized address.
+
+    Every result, including misses, is committed as soon as it is known, so an
+    interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS geocodes ('
+            'address TEXT PRIMARY KEY, latitude REAL, longitude REAL, created REAL)'
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, address: str) -> Tuple[bool, Optional[Coordinates]]:
+        """Return (found, coordinates); coordinates are None for a cached miss."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT latitude, longitude FROM geocodes WHERE address = ?', (address,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, None if row[0] is None else (row[0], row[1])
+
+    def put(self, address: str, coords: Optional[Coordinates]) -> None:
+        lat, lon = coords if coords is not None else (None, None)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)',
+                             (address, lat, lon, time.time()))
+            self._db.commit()
+
+
+def normalize_address(address: Optional[str]) -> str:
+    if not isinstance(address, str):
+        return ''
+    address = unicodedata.normalize('NFKC', address).casefold()
+    address = re.sub(r'[^\w\s]', ' ', address)
+    return re.sub(r'\s+', ' ', address).strip()
+
+
+def address_query(row: pd.Series) -> str:
+    parts = [row.get('Address'), row.get('Taluka'), row.get('District'), row.get('Pincode'), 'Maharashtra']
+    return ', '.join(str(part) for part in parts if isinstance(part, str) and part)
+
+
+def load_pincode_centroids(csv_path: str) -> pd.DataFrame:
+    """Mean coordinates of all post offices per pincode."""
+    pincodes = pd.read_csv(csv_path)
+    pincodes.columns = pincodes.columns.str.strip()
+    pincodes = pincodes.dropna(subset=['postal code', 'latitude', 'longitude'])
+    pincodes['postal code'] = pincodes['postal code'].astype(np.int64)
+    return pincodes.groupby('postal code')[['latitude', 'longitude']].mean()
+
+
+def geocode_with_cache(query: str, geocoder: Geocoder, cache: Optional[GeocodeCache],
+                       rate_limiter: RateLimiter, retries: int = 3) -> Optional[Coordinates]:
+    """Geocode one address, answering from `cache` when it has been looked up before (no caching without one)."""
+    key = normalize_address(query)
+    if cache is not None:
+        found, coords = cache.get(key)
+        if found:
+            return coords
+    for attempt in range(retries):
+        rate_limiter.wait()
+        try:
+            coords = geocoder.geocode(query)
+            break
+        except Exception as e:
+            if attempt == retries - 1:
+                # Leave it uncached so the next run tries again
+                logging.warning(f"Geocoding failed for '{query}': {e}")
+                return None
+            time.sleep(2 ** attempt)
+    if cache is not None:
+        cache.put(key, coords)
+    return coords
+
+
+def enrich(hospitals: pd.DataFrame, pincode_centroids: pd.DataFrame, geocoder: Optional[Geocoder],
+           cache: Optional[GeocodeCache], previous: Optional[pd.DataFrame] = None,
+           workers: int = 4, rate_per_second: float = 1.0) -> pd.DataFrame:
+    """
+    Add latitude, longitude, geo_quality and address_key columns to the hospital frame.
+
+    Rows whose address is unchanged since `previous` keep their earlier coordinates.
+    The others are resolved from their pincode centroid first, and only rows whose
+    pincode is unknown are sent to the geocoder, through `cache` when one is given.
+    """
+    df = hospitals.copy()
+    queries = df.apply(address_query, axis=1)
+    df['address_key'] = [hashlib.sha1(normalize_address(query).encode()).hexdigest() for query in queries]
+    df['latitude'] = np.nan
+    df['longitude'] = np.nan
+    df['geo_quality'] = UNRESOLVED
+
+    pending = pd.Series(True, index=df.index)
+    if previous is not None and 'address_key' in previous.columns:
+        previous = previous[previous['geo_quality'] != UNRESOLVED].drop_duplicates('Hospital_ID')
+        reused = df[['Hospital_ID', 'address_key']].reset_index().merge(
+            previous[['Hospital_ID', 'address_key', 'latitude', 'longitude', 'geo_quality']],
+            on=['Hospital_ID', 'address_key'],
+        ).set_index('index')
+        df.loc[reused.index, ['latitude', 'longitude', 'geo_quality']] = reused[['latitude', 'longitude', 'geo_quality']]
+        pending[reused.index] = False
+    logging.info(f"Reused coordinates for {(~pending).sum()} unchanged rows")
+
+    pincodes = pd.to_numeric(df['Pincode'], errors='coerce')
+    centroid = pincode_centroids.reindex(pincodes.to_numpy())
+    has_centroid = pending.to_numpy() & centroid['latitude'].notna().to_numpy()
+    df.loc[has_centroid, 'latitude'] = centroid['latitude'].to_numpy()[has_centroid]
+    df.loc[has_centroid, 'longitude'] = centroid['longitude'].to_numpy()[has_centroid]
+    df.loc[has_centroid, 'geo_quality'] = PINCODE_CENTROID
+    pending[has_centroid] = False
+    logging.info(f"Resolved {has_centroid.sum()} rows from pincode centroids")
+
+    to_geocode = df.index[pending]
+    if geocoder is not None and len(to_geocode):
+        rate_limiter = RateLimiter(rate_per_second)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda query: geocode_with_cache(query, geocoder, cache, rate_limiter),
+                queries[to_geocode],
+            ))
+        for index, coords in zip(to_geocode, results):
+            if coords is not None:
+                df.loc[index, ['latitude', 'longitude']] = coords
+                df.loc[index, 'geo_quality'] = GEOCODED
+        logging.info(f"Geocoded {sum(coords is not None for coords in results)} of {len(to_geocode)} remaining rows")
+
+    return df
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Add coordinates to hospital_data.parquet")
+    parser.add_argument('--input', default='hospital_data.parquet')
+    parser.add_argument('--output', default='hospital_data_enriched.parquet')
+    parser.add_argument('--pincodes', default='india_pincodes.csv')
+    parser.add_argument('--geocoder', choices=['nominatim', 'stub', 'none'], default='nominatim')
+    parser.add_argument('--stub-file', help="JSON mapping of address to [lat, lon] for --geocoder stub")
+    parser.add_argument('--cache', default='geocode_cache.sqlite')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=1.0, help="Geocoder requests per second")
+    args = parser.parse_args()
+
+    if args.geocoder == 'nominatim':
+        geocoder = NominatimGeocoder()
+    elif args.geocoder == 'stub':
+        geocoder = StubGeocoder.from_json(args.stub_file) if args.stub_file else StubGeocoder({})
+    else:
+        geocoder = None
+
+    previous = pd.read_parquet(args.output) if os.path.exists(args.output) else None
+    df = enrich(
+        pd.read_parquet(args.input),
+        load_pincode_centroids(args.pincodes),
+        geocoder,
+        GeocodeCache(args.cache),
+        previous=previous,
+        workers=args.workers,
+        rate_per_second=args.rate,
+    )
+
+    print("\nGeocoding quality:")
+    print(df['geo_quality'].value_counts())
+
+    tmp_path = f"{args.output}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, args.output)
+    print(f"\nData saved to '{args.output}'")
@@ -1,133 +1,293 @@
-import pandas as pd
-from bs4 import BeautifulSoup
+import os
 import re
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+COLUMNS = ['S.No', 'Hospital_ID', 'Specialties', 'HOSP_DISP_CODE', 'District', 'Taluka',
+           'Hospital_Name', 'Address', 'Pincode', 'MCO_Contact_Number', 'Email']
+
+SCHEMA = pa.schema([('S.No', pa.int64())] + [(column, pa.string()) for column in COLUMNS[1:]])
+
+ROW_GROUP_SIZE = 5000
+READ_CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class Cell:
+    """Text of a <td> plus the attributes of its first link, as the row extractor needs them."""
+    text: str = ''
+    link_text: Optional[str] = None
+    link_title: str = ''
+    link_href: str = ''
+    pieces: List[str] = field(default_factory=list)
+
+
+def extract_row(cells: List[Cell]) -> Optional[Dict[str, str]]:
+    """Map the cells of one table row to a record, or None for rows without data."""
+    if len(cells) == 0:
+        return None
+
+    row_data = {}
+
+    # S.No (index 0)
+    row_data['S.No'] = cells[0].text
+
+    # Hospital ID and Specialties (index 1)
+    hospital_id_cell = cells[1]
+    if hospital_id_cell.link_text is not None:
+        row_data['Hospital_ID'] = hospital_id_cell.link_text
 
-# Read the HTML file
-with open('hospital_info.html', 'r', encoding='utf-8') as file:
-    html_content = file.read()
-
-# Parse HTML with BeautifulSoup
-soup = BeautifulSoup(html_content, 'html.parser')
-
-# Find the main table
-table = soup.find('table', {'id': 'myTable'})
-
-# Initialize lists to store data
-data = []
-
-# Find all table rows (excluding header)
-rows = table.find_all('tr')
-
-# Skip the first row (header)
-for row in rows[1:]:
-    # Get all td elements
-    cells = row.find_all('td')
-    
-    if len(cells) > 0:
-        # Extract data from each cell
-        row_data = {}
-        
-        # S.No (index 0)
-        row_data['S.No'] = cells[0].get_text(strip=True)
-        
-        # Hospital ID and Specialties (index 1)
-        hospital_id_cell = cells[1]
-        hospital_id_link = hospital_id_cell.find('a')
-        
-        if hospital_id_link:
-            row_data['Hospital_ID'] = hospital_id_link.get_text(strip=True)
-            
-            # Extract specialties from title attribute
-            title_attr = hospital_id_link.get('title', '')
-            if 'Specialties are:' in title_attr:
-                # Extract specialties text after "Specialties are:"
-                specialties_text = title_attr.split('Specialties are:')[1].strip()
-                # Split by newlines and clean up
-                specialties_list = [s.strip() for s in specialties_text.split('\n') if s.strip()]
-                row_data['Specialties'] = ', '.join(specialties_list)
-            else:
-                row_data['Specialties'] = ''
+        # Extract specialties from title attribute
+        title_attr = hospital_id_cell.link_title
+        if 'Specialties are:' in title_attr:
+            # Extract specialties text after "Specialties are:"
+            specialties_text = title_attr.split('Specialties are:')[1].strip()
+            # Split by newlines and clean up
+            specialties_list = [s.strip() for s in specialties_text.split('\n') if s.strip()]
+            row_data['Specialties'] = ', '.join(specialties_list)
         else:
-            row_data['Hospital_ID'] = hospital_id_cell.get_text(strip=True)
             row_data['Specialties'] = ''
-        
-        # Hospital Display Code (index 2)
-        row_data['HOSP_DISP_CODE'] = cells[2].get_text(strip=True) if len(cells) > 2 else ''
-        
-        # District (index 3)
-        row_data['District'] = cells[3].get_text(strip=True) if len(cells) > 3 else ''
-        
-        # Taluka (index 4)
-        row_data['Taluka'] = cells[4].get_text(strip=True) if len(cells) > 4 else ''
-        
-        # Hospital Name (index 5)
-        row_data['Hospital_Name'] = cells[5].get_text(strip=True) if len(cells) > 5 else ''
-        
-        # Address (index 6) - Extract from JavaScript function
-        if len(cells) > 6:
-            address_cell = cells[6]
-            address_link = address_cell.find('a')
-            if address_link:
-                onclick_attr = address_link.get('href', '')
-                # Extract address from JavaScript function viewAddress('ADDRESS_TEXT','HOSPITAL_ID')
-                match = re.search(r"viewAddress\('([^']*)'", onclick_attr)
-                if match:
-                    row_data['Address'] = match.group(1).strip()
-                else:
-                    row_data['Address'] = address_cell.get_text(strip=True)
-            else:
-                row_data['Address'] = address_cell.get_text(strip=True)
+    else:
+        row_data['Hospital_ID'] = hospital_id_cell.text
+        row_data['Specialties'] = ''
+
+    # Hospital Display Code, District, Taluka, Hospital Name (index 2-5)
+    row_data['HOSP_DISP_CODE'] = cells[2].text if len(cells) > 2 else ''
+    row_data['District'] = cells[3].text if len(cells) > 3 else ''
+    row_data['Taluka'] = cells[4].text if len(cells) > 4 else ''
+    row_data['Hospital_Name'] = cells[5].text if len(cells) > 5 else ''
+
+    # Address (index 6) - Extract from JavaScript function
+    if len(cells) > 6:
+        address_cell = cells[6]
+        # Extract address from JavaScript function viewAddress('ADDRESS_TEXT','HOSPITAL_ID')
+        match = re.search(r"viewAddress\('([^']*)'", address_cell.link_href)
+        if address_cell.link_text is not None and match:
+            row_data['Address'] = match.group(1).strip()
         else:
-            row_data['Address'] = ''
-        
-        # Pincode (index 7)
-        row_data['Pincode'] = cells[7].get_text(strip=True) if len(cells) > 7 else ''
-        
-        # MCO Contact Number (index 8)
-        row_data['MCO_Contact_Number'] = cells[8].get_text(strip=True) if len(cells) > 8 else ''
-        
-        # Email (index 9)
-        row_data['Email'] = cells[9].get_text(strip=True) if len(cells) > 9 else ''
-        
-        # Only add rows that have actual data (skip empty rows)
-        if row_data['S.No']:
-            data.append(row_data)
-
-# Create DataFrame
-df = pd.DataFrame(data)
-
-# Clean the data
-# Remove extra whitespace
-for col in df.columns:
-    if df[col].dtype == 'object':
-        df[col] = df[col].str.strip()
-
-# Clean Address field - remove extra commas and spaces
-df['Address'] = df['Address'].str.replace(r'\s+', ' ', regex=True)
-df['Address'] = df['Address'].str.replace(r',+', ',', regex=True)
-df['Address'] = df['Address'].str.strip(',').str.strip()
-
-# Clean Hospital Name
-df['Hospital_Name'] = df['Hospital_Name'].str.replace(r'\s+', ' ', regex=True)
-
-# Convert S.No to integer
-df['S.No'] = pd.to_numeric(df['S.No'], errors='coerce')
-
-# Display basic information
-print("DataFrame Shape:", df.shape)
-print("\nFirst few rows:")
-print(df.head())
-print("\nColumn names:")
-print(df.columns.tolist())
-print("\nData types:")
-print(df.dtypes)
-print("\nBasic statistics:")
-print(df.describe())
-
-# Check for missing values
-print("\nMissing values:")
-print(df.isnull().sum())
-
-# Save to paraquet file
-df.to_parquet('hospital_data.parquet', index=False)
-print("\nData saved to 'hospital_data.parquet'")
+            row_data['Address'] = address_cell.text
+    else:
+        row_data['Address'] = ''
+
+    # Pincode, MCO Contact Number, Email (index 7-9)
+    row_data['Pincode'] = cells[7].text if len(cells) > 7 else ''
+    row_data['MCO_Contact_Number'] = cells[8].text if len(cells) > 8 else ''
+    row_data['Email'] = cells[9].text if len(cells) > 9 else ''
+
+    # Only keep rows that have actual data (skip empty rows)
+    return row_data if row_data['S.No'] else None
+
+
+class HospitalTableParser(HTMLParser):
+    """
+    Incremental parser for the `myTable` hospital table.
+
+    Feed it the HTML in chunks; completed records are appended to `columns`
+    (one list per column) without building a document tree.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.columns: Dict[str, List[str]] = {column: [] for column in COLUMNS}
+        self._in_table = False
+        self._table_done = False
+        self._rows_seen = 0
+        self._cells: Optional[List[Cell]] = None
+        self._cell: Optional[Cell] = None
+        self._link: Optional[Cell] = None
+        self._text: List[str] = []
+
+    def _flush_text(self) -> None:
+        # Mirror BeautifulSoup's get_text(strip=True): strip each text node and join them
+        text = ''.join(self._text).strip()
+        self._text = []
+        if text:
+            if self._cell is not None:
+                self._cell.pieces.append(text)
+            if self._link is not None:
+                self._link.pieces.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if self._table_done:
+            return
+        if tag == 'table' and not self._in_table:
+            self._in_table = dict(attrs).get('id') == 'myTable'
+            return
+        if not self._in_table:
+            return
+        self._flush_text()
+        if tag == 'tr':
+            self._cells = []
+        elif tag == 'td' and self._cells is not None:
+            self._cell = Cell()
+        elif tag == 'a' and self._cell is not None and self._cell.link_text is None and self._link is None:
+            attributes = dict(attrs)
+            self._link = Cell(link_title=attributes.get('title') or '', link_href=attributes.get('href') or '')
+
+    def handle_endtag(self, tag):
+        if not self._in_table or self._table_done:
+            return
+        self._flush_text()
+        if tag == 'a' and self._link is not None:
+            self._cell.link_text = ''.join(self._link.pieces)
+            self._cell.link_title = self._link.link_title
+            self._cell.link_href = self._link.link_href
+            self._link = None
+        elif tag == 'td' and self._cell is not None:
+            self._cell.text = ''.join(self._cell.pieces)
+            self._cells.append(self._cell)
+            self._cell = None
+        elif tag == 'tr' and self._cells is not None:
+            # The first row is the header
+            if self._rows_seen > 0:
+                row_data = extract_row(self._cells)
+                if row_data is not None:
+                    for column in COLUMNS:
+                        self.columns[column].append(row_data[column])
+            self._rows_seen += 1
+            self._cells = None
+        elif tag == 'table':
+            self._table_done = True
+
+    def handle_data(self, data):
+        if self._in_table and self._cell is not None:
+            self._text.append(data)
+
+    def take_rows(self) -> Dict[str, List[str]]:
+        rows = self.columns
+        self.columns = {column: [] for column in COLUMNS}
+        return rows
+
+
+def iter_row_batches(html_path: str, batch_size: int = ROW_GROUP_SIZE) -> Iterator[Dict[str, List[str]]]:
+    """Stream an HTML file through the parser, yielding batches of up to `batch_size` rows as column lists."""
+    parser = HospitalTableParser()
+    with open(html_path, 'r', encoding='utf-8') as file:
+        for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), ''):
+            parser.feed(chunk)
+            if len(parser.columns['S.No']) >= batch_size:
+                yield parser.take_rows()
+    parser.close()
+    if parser.columns['S.No']:
+        yield parser.take_rows()
+
+
+def iter_row_batches_soup(html_path: str, batch_size: int = ROW_GROUP_SIZE) -> Iterator[Dict[str, List[str]]]:
+    """Parse with a full BeautifulSoup tree. Slower and holds the document in memory."""
+    from bs4 import BeautifulSoup
+
+    with open(html_path, 'r', encoding='utf-8') as file:
+        soup = BeautifulSoup(file.read(), 'html.parser')
+
+    columns = {column: [] for column in COLUMNS}
+    # Skip the first row (header)
+    for row in soup.find('table', {'id': 'myTable'}).find_all('tr')[1:]:
+        cells = []
+        for td in row.find_all('td'):
+            link = td.find('a')
+            cells.append(Cell(
+                text=td.get_text(strip=True),
+                link_text=link.get_text(strip=True) if link else None,
+                link_title=link.get('title', '') if link else '',
+                link_href=link.get('href', '') if link else '',
+            ))
+        row_data = extract_row(cells)
+        if row_data is None:
+            continue
+        for column in COLUMNS:
+            columns[column].append(row_data[column])
+        if len(columns['S.No']) >= batch_size:
+            yield columns
+            columns = {column: [] for column in COLUMNS}
+    if columns['S.No']:
+        yield columns
+
+
+def clean_batch(columns: Dict[str, List[str]]) -> pd.DataFrame:
+    df = pd.DataFrame({column: pd.array(columns[column], dtype='string') for column in COLUMNS})
+
+    # Remove extra whitespace
+    for column in COLUMNS:
+        df[column] = df[column].str.strip()
+
+    # Clean Address field - remove extra commas and spaces
+    df['Address'] = df['Address'].str.replace(r'\s+', ' ', regex=True)
+    df['Address'] = df['Address'].str.replace(r',+', ',', regex=True)
+    df['Address'] = df['Address'].str.strip(',').str.strip()
+
+    # Clean Hospital Name
+    df['Hospital_Name'] = df['Hospital_Name'].str.replace(r'\s+', ' ', regex=True)
+
+    # Convert S.No to integer
+    df['S.No'] = pd.to_numeric(df['S.No'], errors='coerce').astype('Int64')
+    return df
+
+
+def write_file_to_parquet(html_path: str, parquet_path: str, parser: str = 'stream') -> int:
+    """Parse one HTML file and write it as parquet, one row group per batch. Returns the row count."""
+    batches = iter_row_batches(html_path) if parser == 'stream' else iter_row_batches_soup(html_path)
+    rows = 0
+    with pq.ParquetWriter(parquet_path, SCHEMA) as writer:
+        for columns in batches:
+            df = clean_batch(columns)
+            writer.write_table(pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False))
+            rows += len(df)
+    return rows
+
+
+def parse_hospital_files(html_paths: List[str], output_path: str, parser: str = 'stream',
+                         workers: int = os.cpu_count() or 1) -> int:
+    """
+    Parse several HTML files in parallel and merge them into one parquet file.
+
+    Each worker writes its own part file; the parts are then copied row group by
+    row group into `output_path`, in input order.
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp_dir:
+        part_paths = [os.path.join(tmp_dir, f'part-{i}.parquet') for i in range(len(html_paths))]
+        with ProcessPoolExecutor(max_workers=min(workers, len(html_paths))) as executor:
+            counts = list(executor.map(write_file_to_parquet, html_paths, part_paths,
+                                       [parser] * len(html_paths)))
+        for html_path, count in zip(html_paths, counts):
+            print(f"{html_path}: {count} rows")
+
+        with pq.ParquetWriter(output_path, SCHEMA) as writer:
+            for part_path in part_paths:
+                part = pq.ParquetFile(part_path)
+                for i in range(part.num_row_groups):
+                    writer.write_table(part.read_row_group(i))
+    return sum(counts)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parse hospital empanelment HTML into parquet")
+    arg_parser.add_argument('inputs', nargs='*', default=['hospital_info.html'])
+    arg_parser.add_argument('--output', default='hospital_data.parquet')
+    arg_parser.add_argument('--parser', choices=['stream', 'soup'], default='stream')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = arg_parser.parse_args()
+
+    total = parse_hospital_files(args.inputs, args.output, parser=args.parser, workers=args.workers)
+
+    # Display basic information
+    metadata = pq.ParquetFile(args.output).metadata
+    print("\nRows:", total, "Row groups:", metadata.num_row_groups)
+    df = pd.read_parquet(args.output)
+    print("\nFirst few rows:")
+    print(df.head())
+    print("\nData types:")
+    print(df.dtypes)
+
+    # Check for missing values
+    print("\nMissing values:")
+    print(df.isnull().sum())
+
+    print(f"\nData saved to '{args.output}'")
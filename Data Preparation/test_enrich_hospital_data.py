@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import enrich_hospital_data
+from enrich_hospital_data import (GEOCODED, PINCODE_CENTROID, UNRESOLVED, GeocodeCache, StubGeocoder,
+                                  address_query, enrich)
+
+CENTROIDS = pd.DataFrame(
+    {'latitude': [18.52, 19.07], 'longitude': [73.85, 72.88]},
+    index=pd.Index([411001, 400001], name='postal code'),
+)
+
+
+def hospital(hospital_id, address, pincode):
+    return {'Hospital_ID': hospital_id, 'Address': address, 'Taluka': 'Haveli', 'District': 'Pune',
+            'Pincode': pincode}
+
+
+@pytest.fixture
+def hospitals():
+    return pd.DataFrame([
+        hospital(1, 'Station Road', '411001'),
+        hospital(2, 'Market Lane', '499999'),
+        hospital(3, 'Temple Street', '499998'),
+        hospital(4, 'Nowhere Road', '499997'),
+    ])
+
+
+def stub_for(hospitals, coords_by_id):
+    """A stub geocoder that knows the addresses of the given hospitals."""
+    rows = hospitals.set_index('Hospital_ID')
+    return StubGeocoder({address_query(rows.loc[i]): coords for i, coords in coords_by_id.items()})
+
+
+def run(hospitals, geocoder, cache, previous=None):
+    return enrich(hospitals, CENTROIDS, geocoder, cache, previous=previous, workers=2, rate_per_second=0)
+
+
+def test_pincode_centroid_is_used_before_the_geocoder(hospitals, tmp_path):
+    geocoder = stub_for(hospitals.iloc[:1], {1: (10.0, 70.0)})
+    df = run(hospitals.iloc[:1], geocoder, GeocodeCache(str(tmp_path / 'cache.sqlite')))
+
+    assert df.loc[0, 'geo_quality'] == PINCODE_CENTROID
+    assert (df.loc[0, 'latitude'], df.loc[0, 'longitude']) == (18.52, 73.85)
+    assert geocoder.calls == 0
+
+
+def test_rows_without_centroid_fall_back_to_the_geocoder(hospitals, tmp_path):
+    geocoder = stub_for(hospitals, {2: (17.0, 74.0), 3: (16.5, 74.5)})
+    df = run(hospitals, geocoder, GeocodeCache(str(tmp_path / 'cache.sqlite')))
+
+    assert df['geo_quality'].tolist() == [PINCODE_CENTROID, GEOCODED, GEOCODED, UNRESOLVED]
+    assert df.loc[1, ['latitude', 'longitude']].tolist() == [17.0, 74.0]
+    assert np.isnan(df.loc[3, 'latitude'])
+    assert geocoder.calls == 3
+
+
+def test_misses_are_cached(hospitals, tmp_path):
+    cache_path = str(tmp_path / 'cache.sqlite')
+    run(hospitals, stub_for(hospitals, {2: (17.0, 74.0)}), GeocodeCache(cache_path))
+
+    # Unresolved rows are not reused from the previous output, so the rerun goes through the cache
+    geocoder = stub_for(hospitals, {3: (16.5, 74.5), 4: (16.0, 75.0)})
+    df = run(hospitals, geocoder, GeocodeCache(cache_path))
+
+    assert geocoder.calls == 0
+    assert df['geo_quality'].tolist() == [PINCODE_CENTROID, GEOCODED, UNRESOLVED, UNRESOLVED]
+
+
+def test_interrupted_run_resumes_from_the_cache(hospitals, tmp_path, monkeypatch):
+    monkeypatch.setattr(enrich_hospital_data.time, 'sleep', lambda seconds: None)
+    cache_path = str(tmp_path / 'cache.sqlite')
+    coords = {2: (17.0, 74.0), 3: (16.5, 74.5), 4: (16.0, 75.0)}
+    failing_query = address_query(hospitals.iloc[2])
+
+    class FailingGeocoder(StubGeocoder):
+        def geocode(self, query):
+            if query == failing_query:
+                raise ConnectionError('connection reset')
+            return super().geocode(query)
+
+    first = run(hospitals, FailingGeocoder(stub_for(hospitals, coords).mapping), GeocodeCache(cache_path))
+    assert first.loc[2, 'geo_quality'] == UNRESOLVED
+
+    geocoder = stub_for(hospitals, coords)
+    df = run(hospitals, geocoder, GeocodeCache(cache_path))
+
+    assert geocoder.calls == 1
+    assert df['geo_quality'].tolist() == [PINCODE_CENTROID, GEOCODED, GEOCODED, GEOCODED]
+
+
+def test_only_changed_addresses_are_geocoded_again(hospitals, tmp_path):
+    previous = run(hospitals, stub_for(hospitals, {2: (17.0, 74.0), 3: (16.5, 74.5)}),
+                   GeocodeCache(str(tmp_path / 'first.sqlite')))
+
+    changed = hospitals.copy()
+    changed.loc[1, 'Address'] = 'New Market Lane'
+    # A fresh cache and different answers, so reused rows are told apart from geocoded ones
+    geocoder = stub_for(changed, {2: (17.5, 74.1), 3: (0.0, 0.0)})
+    df = run(changed, geocoder, GeocodeCache(str(tmp_path / 'second.sqlite')), previous=previous)
+
+    assert df.loc[1, 'address_key'] != previous.loc[1, 'address_key']
+    assert df.loc[1, ['latitude', 'longitude']].tolist() == [17.5, 74.1]
+    assert df.loc[2, ['latitude', 'longitude']].tolist() == [16.5, 74.5]
+    # The changed row and the row that was unresolved before
+    assert geocoder.calls == 2
+
+
+def test_geocodes_without_a_cache(hospitals):
+    geocoder = stub_for(hospitals, {2: (17.0, 74.0)})
+    df = run(hospitals, geocoder, None)
+
+    assert df['geo_quality'].tolist() == [PINCODE_CENTROID, GEOCODED, UNRESOLVED, UNRESOLVED]
+    assert geocoder.calls == 3
@@ -0,0 +1,220 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Callable, Generic, Optional, TypeVar
+
+import pandas as pd
+
+from spatial_index import HospitalIndex
+from pincode_table import PincodeTable
+from speciality_index import SpecialityIndex
+
+HOSPITALS_PATH = os.getenv("HOSPITALS_PATH", "hospital_data_enriched.parquet")
+PINCODES_PATH = os.getenv("PINCODES_PATH", "india_pincodes.csv")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+RELOAD_CHECK_SECONDS = float(os.getenv("RELOAD_CHECK_SECONDS", "30"))
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Immutable set of reference data derived from one version of the source files."""
+    version: str
+    hospitals_df: pd.DataFrame
+    hospital_index: HospitalIndex
+    pincode_table: PincodeTable
+    speciality_index: SpecialityIndex
+
+
+def source_version(hospitals_path: str = HOSPITALS_PATH, pincodes_path: str = PINCODES_PATH) -> str:
+    """Version id of the source files, derived from their size and modification time."""
+    digest = hashlib.sha1()
+    for path in (hospitals_path, pincodes_path):
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def build_snapshot(snapshot_dir: str = SNAPSHOT_DIR, hospitals_path: str = HOSPITALS_PATH,
+                   pincodes_path: str = PINCODES_PATH) -> str:
+    """
+    Compile the source files into a snapshot directory, unless it already exists.
+
+    The snapshot is written to a temporary directory and renamed into place, so
+    concurrent builders (one per worker process) never expose a partial snapshot.
+
+    Returns:
+        The snapshot directory path.
+    """
+    version = source_version(hospitals_path, pincodes_path)
+    target = os.path.join(snapshot_dir, version)
+    if os.path.isdir(target):
+        return target
+
+    logging.info(f"Building reference data snapshot {version}")
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=snapshot_dir)
+    try:
+        hospitals_df = pd.read_parquet(hospitals_path)
+        hospitals_df.to_parquet(os.path.join(tmp_dir, "hospitals.parquet"), index=False)
+        HospitalIndex(hospitals_df["latitude"], hospitals_df["longitude"]).save(tmp_dir)
+        SpecialityIndex.from_specialities(hospitals_df["Specialties"]).save(tmp_dir)
+        PincodeTable.from_csv(pincodes_path).save(os.path.join(tmp_dir, "pincodes.npy"))
+        try:
+            os.rename(tmp_dir, target)
+            prune_snapshots(snapshot_dir)
+        except OSError:
+            # Another worker finished the same snapshot first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return target
+
+
+def prune_snapshots(snapshot_dir: str = SNAPSHOT_DIR, keep: int = 2) -> None:
+    """Delete all but the newest `keep` snapshots. Processes that still map an old one keep their view of it."""
+    snapshots = sorted(
+        (entry for entry in os.scandir(snapshot_dir) if entry.is_dir() and not entry.name.startswith(".")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in snapshots[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """Load a snapshot; the index and pincode arrays are memory-mapped and shared between processes."""
+    return Snapshot(
+        version=os.path.basename(path),
+        hospitals_df=pd.read_parquet(os.path.join(path, "hospitals.parquet")),
+        hospital_index=HospitalIndex.load(path),
+        pincode_table=PincodeTable.load(os.path.join(path, "pincodes.npy")),
+        speciality_index=SpecialityIndex.load(path),
+    )
+
+
+class DataRegistry:
+    """
+    Serves the current reference data snapshot and swaps in a new one when the source files change.
+
+    Callers take a snapshot once per request and use it throughout, so a swap never
+    changes the data under an in-flight request. Changes are detected at most every
+    `check_seconds`, and the new snapshot is built on a background thread while the
+    old one keeps serving.
+    """
+
+    def __init__(self, snapshot_dir: str = SNAPSHOT_DIR, hospitals_path: str = HOSPITALS_PATH,
+                 pincodes_path: str = PINCODES_PATH, check_seconds: float = RELOAD_CHECK_SECONDS):
+        self.snapshot_dir = snapshot_dir
+        self.hospitals_path = hospitals_path
+        self.pincodes_path = pincodes_path
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[Snapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def _load_latest(self) -> Snapshot:
+        return load_snapshot(build_snapshot(self.snapshot_dir, self.hospitals_path, self.pincodes_path))
+
+    def _reload(self) -> None:
+        try:
+            snapshot = self._load_latest()
+            self._snapshot = snapshot
+            logging.info(f"Reference data snapshot {snapshot.version} is now live")
+        except Exception as e:
+            logging.error(f"Failed to reload reference data, keeping the current snapshot: {e}")
+        finally:
+            self._reloading = False
+
+    def current(self) -> Snapshot:
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load_latest()
+                    self._checked_at = time.monotonic()
+            return self._snapshot
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            with self._lock:
+                if now - self._checked_at >= self.check_seconds and not self._reloading:
+                    self._checked_at = now
+                    try:
+                        changed = source_version(self.hospitals_path, self.pincodes_path) != self._snapshot.version
+                    except OSError as e:
+                        # Source files are being replaced; check again next time
+                        logging.warning(f"Could not check reference data: {e}")
+                        changed = False
+                    if changed:
+                        self._reloading = True
+                        threading.Thread(target=self._reload, daemon=True).start()
+        return self._snapshot
+
+
+class Reloadable(Generic[T]):
+    """
+    Creates a resource on first use, and again whenever the files it is built from change.
+
+    `version` identifies the current files. Like DataRegistry, it is checked at most
+    every `check_seconds`, and a new resource is built on a background thread while
+    the old one keeps serving. A build during which the files changed again is
+    discarded and retried at the next check. `factory` gets the previous resource,
+    so it can carry over the parts that do not depend on the files.
+    """
+
+    def __init__(self, factory: Callable[[Optional[T]], T], version: Callable[[], str],
+                 check_seconds: float = RELOAD_CHECK_SECONDS):
+        self._factory = factory
+        self._version = version
+        self.check_seconds = check_seconds
+        self._value: Optional[T] = None
+        self._loaded_version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def _reload(self, version: str) -> None:
+        try:
+            value = self._factory(self._value)
+            if self._version() == version:
+                self._value = value
+                self._loaded_version = version
+                logging.info(f"Reloaded {type(value).__name__} after its files changed")
+        except Exception as e:
+            logging.error(f"Failed to reload {type(self._value).__name__}, keeping the current one: {e}")
+        finally:
+            self._reloading = False
+
+    def get(self) -> T:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    version = self._version()
+                    self._value = self._factory(None)
+                    self._loaded_version = version
+                    self._checked_at = time.monotonic()
+            return self._value
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            with self._lock:
+                if now - self._checked_at >= self.check_seconds and not self._reloading:
+                    self._checked_at = now
+                    version = self._version()
+                    if version != self._loaded_version:
+                        self._reloading = True
+                        threading.Thread(target=self._reload, args=(version,), daemon=True).start()
+        return self._value
+
+
+if __name__ == "__main__":
+    path = build_snapshot()
+    print(f"Snapshot saved to '{path}'")
@@ -0,0 +1,164 @@
+import os
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_chroma import Chroma
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google")
+GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "models/gemini-embedding-001")
+# Multilingual by default so Marathi and Hindi queries land near the English scheme documents
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL",
+                                  "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+
+COLLECTION_NAME = "sevahealth_ai_docs"
+PERSIST_DIRECTORY = "./chroma_langchain_db"
+
+# Output sizes of the Google models we use, so the guard can check them without an API call
+GOOGLE_EMBEDDING_DIMENSIONS = {
+    "models/gemini-embedding-001": 3072,
+    "models/text-embedding-004": 768,
+    "models/embedding-001": 768,
+}
+
+
+class EmbeddingMismatchError(ValueError):
+    """Raised when a collection was built with a different embedding model than the one configured."""
+
+
+@dataclass
+class EmbeddingProvider:
+    embeddings: Embeddings
+    model_id: str
+    dimension: Optional[int] = None
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU embeddings from a sentence-transformers model, computed in batches.
+
+    Vectors are L2-normalized float32, so cosine similarity is a dot product.
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE, device: str = "cpu"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.batch_size = batch_size
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def embed_numpy(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_numpy(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_numpy([text])[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+
+def _google_provider() -> EmbeddingProvider:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    embeddings = GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL,
+                    google_api_key=os.getenv("GOOGLE_API_KEY"))
+    return EmbeddingProvider(embeddings, f"google:{GOOGLE_EMBEDDING_MODEL}",
+                             GOOGLE_EMBEDDING_DIMENSIONS.get(GOOGLE_EMBEDDING_MODEL))
+
+
+def _local_provider() -> EmbeddingProvider:
+    embeddings = LocalEmbeddings()
+    return EmbeddingProvider(embeddings, f"local:{LOCAL_EMBEDDING_MODEL}", embeddings.dimension)
+
+
+PROVIDERS: Dict[str, Callable[[], EmbeddingProvider]] = {
+    "google": _google_provider,
+    "local": _local_provider,
+}
+
+
+def register_provider(name: str, factory: Callable[[], EmbeddingProvider]) -> None:
+    PROVIDERS[name] = factory
+
+
+def get_embedding_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """Create the embedding provider selected by `EMBEDDING_PROVIDER`."""
+    name = name or EMBEDDING_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {name}. Available: {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+
+def check_embedding_metadata(vector_store: Chroma, provider: EmbeddingProvider, record: bool = False) -> None:
+    """
+    Compare the embedding model recorded on the collection with the configured provider.
+
+    Args:
+        vector_store: The opened collection.
+        provider: The configured embedding provider.
+        record: Store the provider's model and dimension on the collection if none is recorded yet.
+
+    Raises:
+        EmbeddingMismatchError: If the collection was built with another model or dimension.
+    """
+    collection = vector_store._collection
+    metadata = dict(collection.metadata or {})
+    stored_model = metadata.get("embedding_model")
+    stored_dimension = metadata.get("embedding_dimension")
+
+    if stored_model is not None and stored_model != provider.model_id:
+        raise EmbeddingMismatchError(
+            f"Collection '{collection.name}' was built with {stored_model}, "
+            f"but the configured embedding model is {provider.model_id}"
+        )
+    if stored_dimension is not None and provider.dimension is not None and stored_dimension != provider.dimension:
+        raise EmbeddingMismatchError(
+            f"Collection '{collection.name}' holds {stored_dimension}-dimensional vectors, "
+            f"but {provider.model_id} produces {provider.dimension}"
+        )
+
+    if stored_model is None:
+        if not record:
+            logging.warning(f"Collection '{collection.name}' has no recorded embedding model")
+            return
+        metadata["embedding_model"] = provider.model_id
+        if provider.dimension is not None:
+            metadata["embedding_dimension"] = provider.dimension
+        # The distance settings are fixed at creation and can't be passed to modify()
+        collection.modify(metadata={k: v for k, v in metadata.items() if not k.startswith("hnsw:")})
+
+
+def open_vector_store(provider: EmbeddingProvider, embedding_function: Optional[Embeddings] = None,
+                      record: bool = False) -> Chroma:
+    """
+    Open the document collection and verify it matches the embedding provider.
+
+    Args:
+        provider: The configured embedding provider.
+        embedding_function: Embeddings to query with, defaults to the provider's own.
+        record: Record the provider on the collection if nothing is recorded yet.
+    """
+    vector_store = Chroma(
+        collection_name=COLLECTION_NAME,
+        embedding_function=embedding_function or provider.embeddings,
+        persist_directory=PERSIST_DIRECTORY,
+    )
+    check_embedding_metadata(vector_store, provider, record=record)
+    return vector_store
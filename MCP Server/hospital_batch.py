@@ -0,0 +1,104 @@
+import os
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from data_registry import Snapshot
+from hospital_payload import clamp_limit, hospital_records
+from mcp_telemetry import span
+
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "10000"))
+MAX_BATCH_RADIUS_KM = 100
+# Queries answered per vectorized pass; results are streamed after each pass
+BATCH_CHUNK_SIZE = 1000
+
+
+def batch_hospitals(snapshot: Snapshot, pincodes: Optional[Sequence[int]] = None,
+                    points: Optional[Sequence[Sequence[float]]] = None, radius_km: float = 10,
+                    k: int = 5, speciality: Optional[str] = None, fields: str = "summary",
+                    chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Nearest hospitals for many pincodes or (latitude, longitude) points.
+
+    The queries are answered with the same snapshot and spatial index as
+    `find_hospitals`, `chunk_size` at a time through `HospitalIndex.query_many`.
+
+    Args:
+        snapshot: Reference data to answer from, taken once for the whole batch.
+        pincodes: Pincodes to search around.
+        points: [latitude, longitude] pairs to search around, instead of pincodes.
+        radius_km: Search radius (up to MAX_BATCH_RADIUS_KM).
+        k: Hospitals per query (1-25).
+        speciality: Optional speciality code or name the hospitals must offer.
+        fields: "summary" or "detail" field set.
+
+    Returns:
+        An iterator of one result per query, in input order: its index, pincode or
+        point, and hospitals, or an error for a pincode without coordinates.
+
+    Raises:
+        ValueError: If the parameters are invalid. Raised before any result is produced.
+    """
+    if (pincodes is None) == (points is None):
+        raise ValueError("Pass either pincodes or points")
+    try:
+        if pincodes is not None:
+            pincodes = np.asarray([int(pincode) for pincode in pincodes], dtype=np.int64)
+            coords = snapshot.pincode_table.lookup_many(pincodes)
+        else:
+            coords = np.asarray(points, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError("pincodes must be integers and points [latitude, longitude] pairs")
+    if len(coords) == 0:
+        raise ValueError("No queries given")
+    if coords.ndim != 2 or coords.shape[1] != 2:
+        raise ValueError("points must be [latitude, longitude] pairs")
+    if len(coords) > MAX_BATCH_QUERIES:
+        raise ValueError(f"At most {MAX_BATCH_QUERIES} queries per batch")
+    if not 0 < radius_km <= MAX_BATCH_RADIUS_KM:
+        raise ValueError(f"radius_km must be between 0 and {MAX_BATCH_RADIUS_KM}")
+    if fields not in ("summary", "detail"):
+        raise ValueError(f"Unknown field set: {fields}")
+
+    mask = None
+    if speciality:
+        # An ambiguous partial name raises AmbiguousSpecialityError, a ValueError
+        codes = snapshot.speciality_index.resolve(speciality)
+        if not codes:
+            raise ValueError(f"Unknown speciality: {speciality}")
+        mask = snapshot.speciality_index.mask(codes)
+
+    return _iter_batch(snapshot, pincodes, coords, radius_km, clamp_limit(k), mask, fields, chunk_size)
+
+
+def _iter_batch(snapshot: Snapshot, pincodes: Optional[np.ndarray], coords: np.ndarray, radius_km: float,
+                k: int, mask: Optional[np.ndarray], fields: str, chunk_size: int) -> Iterator[dict]:
+    for start in range(0, len(coords), chunk_size):
+        chunk = coords[start:start + chunk_size]
+        with span("hospital_batch_query"):
+            matches = snapshot.hospital_index.query_many(chunk[:, 0], chunk[:, 1], k=k, radius_km=radius_km, mask=mask)
+
+        # Project all hospitals of the chunk in one go, then split them per query
+        counts = [len(row_ids) for row_ids, _ in matches]
+        records: List[dict] = hospital_records(
+            snapshot.hospitals_df,
+            np.concatenate([row_ids for row_ids, _ in matches]),
+            np.concatenate([distances for _, distances in matches]),
+            fields,
+        )
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        for i, (lat, lon) in enumerate(chunk):
+            index = start + i
+            result = {"index": index}
+            if pincodes is not None:
+                result["pincode"] = int(pincodes[index])
+                if np.isnan(lat):
+                    result["hospitals"] = []
+                    result["error"] = f"Unknown pincode: {pincodes[index]}"
+                    yield result
+                    continue
+            else:
+                result["point"] = [float(lat), float(lon)]
+            result["hospitals"] = records[offsets[i]:offsets[i + 1]]
+            yield result
@@ -0,0 +1,82 @@
+import json
+import base64
+import math
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SUMMARY_FIELDS = ["Hospital_Name", "District", "Taluka", "Pincode", "MCO_Contact_Number"]
+DETAIL_FIELDS = SUMMARY_FIELDS + ["Hospital_ID", "HOSP_DISP_CODE", "Address", "Specialties", "Email",
+                                  "latitude", "longitude"]
+FIELD_SETS = {"summary": SUMMARY_FIELDS, "detail": DETAIL_FIELDS}
+
+DEFAULT_PAGE_SIZE = 5
+MAX_PAGE_SIZE = 25
+DISTANCE_DECIMALS = 1
+
+
+def dumps(payload: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode_cursor(offset: int, query: str) -> str:
+    token = json.dumps({"o": offset, "q": query}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], query: str) -> int:
+    """
+    Return the offset stored in a cursor, or 0 for the first page.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different query.
+    """
+    if not cursor:
+        return 0
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(token["o"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if token.get("q") != query or offset < 0:
+        raise ValueError("Cursor does not belong to this search")
+    return offset
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def hospital_records(hospitals_df: pd.DataFrame, row_ids: np.ndarray, distances: np.ndarray,
+                     fields: str = "summary") -> List[dict]:
+    """
+    Project the given hospital rows onto a field set, adding the rounded distance.
+
+    Raises:
+        ValueError: If `fields` is not a known field set.
+    """
+    if fields not in FIELD_SETS:
+        raise ValueError(f"Unknown field set: {fields}. Use one of {sorted(FIELD_SETS)}")
+    columns = [column for column in FIELD_SETS[fields] if column in hospitals_df.columns]
+    values = [hospitals_df[column].to_numpy()[row_ids] for column in columns]
+    rounded = np.round(distances.astype(float), DISTANCE_DECIMALS)
+    return [
+        {**{column: _plain(value) for column, value in zip(columns, row)}, "distance_km": float(distance)}
+        for row, distance in zip(zip(*values), rounded)
+    ]
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
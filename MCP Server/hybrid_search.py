@@ -0,0 +1,83 @@
+from typing import Dict, Hashable, List, Optional, Sequence
+
+from lexical_index import BM25Index, tokenize
+
+RRF_K = 60
+MMR_LAMBDA = 0.7
+
+
+def chunk_key(metadata: dict) -> Hashable:
+    """Identity of a chunk shared by the vector store and the lexical index."""
+    return metadata.get("source"), metadata.get("chunk")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], rrf_k: int = RRF_K) -> Dict[Hashable, float]:
+    """Fuse several ranked lists of keys into one score per key: sum of 1 / (rrf_k + rank)."""
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return scores
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_select(candidates: List[dict], scores: List[float], k: int, mmr_lambda: float = MMR_LAMBDA) -> List[dict]:
+    """
+    Pick k candidates by maximal marginal relevance.
+
+    Similarity between chunks is the Jaccard overlap of their token sets, which is
+    high for neighbouring chunks that share the splitter's overlap window, so those
+    near-duplicates are pushed down in favour of new content.
+    """
+    if not candidates:
+        return []
+    top = max(scores) or 1.0
+    relevance = [score / top for score in scores]
+    token_sets = [set(tokenize(candidate["content"])) for candidate in candidates]
+
+    selected: List[int] = []
+    remaining = list(range(len(candidates)))
+    while remaining and len(selected) < k:
+        best = max(
+            remaining,
+            key=lambda i: mmr_lambda * relevance[i]
+            - (1 - mmr_lambda) * max((_jaccard(token_sets[i], token_sets[j]) for j in selected), default=0.0),
+        )
+        selected.append(best)
+        remaining.remove(best)
+    return [candidates[i] for i in selected]
+
+
+def hybrid_search(query: str, vector_hits: List[dict], lexical_index: Optional[BM25Index],
+                  k: int, fetch_k: int, sources: Optional[Sequence[str]] = None) -> List[dict]:
+    """
+    Fuse vector and BM25 results with reciprocal rank fusion and de-duplicate with MMR.
+
+    Args:
+        query: The search query.
+        vector_hits: Vector search results as {"content", "metadata"} dicts, best first.
+        lexical_index: BM25 index over the same chunks, or None to use vector results only.
+        k: Number of results to return.
+        fetch_k: Number of candidates to take from each retriever.
+        sources: Only return chunks from these source documents.
+    """
+    candidates = {chunk_key(hit["metadata"]): hit for hit in vector_hits}
+    rankings = [list(candidates)]
+
+    if lexical_index is not None:
+        lexical_ranking = []
+        for idx, _ in lexical_index.search(query, fetch_k, sources=sources):
+            metadata = lexical_index.metadatas[idx]
+            key = chunk_key(metadata)
+            candidates.setdefault(key, {"content": lexical_index.texts[idx], "metadata": metadata})
+            lexical_ranking.append(key)
+        rankings.append(lexical_ranking)
+
+    fused = reciprocal_rank_fusion(rankings)
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return mmr_select([candidates[key] for key in ordered], [fused[key] for key in ordered], k)
@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# \w misses Devanagari vowel signs and viramas, so include the whole block to keep
+# Marathi and Hindi words in one token
+TOKEN_PATTERN = re.compile(r"[\w\u0900-\u097F]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over the document chunks.
+
+    Built at ingestion time from the same chunks as the vector store and persisted
+    as JSON next to it, so exact terms like scheme names and drug names can be
+    matched without a vector query.
+    """
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[dict],
+                 postings: Dict[str, Tuple[List[int], List[int]]], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.postings = {
+            term: (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        self.doc_lengths = np.zeros(len(ids), dtype=np.float32)
+        for docs, tfs in self.postings.values():
+            np.add.at(self.doc_lengths, docs, tfs)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(ids) else 0.0
+        self._sources = np.asarray([metadata.get("source", "") for metadata in metadatas], dtype=object)
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], metadatas: List[dict]) -> "BM25Index":
+        postings: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        for doc_idx, text in enumerate(texts):
+            for term, tf in Counter(tokenize(text)).items():
+                docs, tfs = postings[term]
+                docs.append(doc_idx)
+                tfs.append(tf)
+        return cls(ids, texts, metadatas, dict(postings))
+
+    @classmethod
+    def load(cls, index_path: str) -> "BM25Index":
+        with open(index_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["ids"], data["texts"], data["metadatas"], data["postings"],
+                   k1=data["k1"], b=data["b"])
+
+    def save(self, index_path: str) -> None:
+        data = {
+            "ids": self.ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+            "k1": self.k1,
+            "b": self.b,
+            "postings": {
+                term: (docs.tolist(), tfs.astype(int).tolist())
+                for term, (docs, tfs) in self.postings.items()
+            },
+        }
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def search(self, query: str, k: int, sources: Optional[Sequence[str]] = None) -> List[Tuple[int, float]]:
+        """
+        Score the chunks against the query.
+
+        Returns:
+            Up to k (chunk index, score) pairs with a positive score, best first.
+        """
+        n_docs = len(self.ids)
+        if n_docs == 0:
+            return []
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        if sources:
+            scores[~np.isin(self._sources, list(sources))] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(idx), float(scores[idx])) for idx in candidates]
+
+
+def build_lexical_index(vector_store, index_path: str) -> BM25Index:
+    """Rebuild the BM25 index from every chunk currently in the vector store."""
+    contents = vector_store.get(include=["documents", "metadatas"])
+    index = BM25Index.build(contents["ids"], contents["documents"], contents["metadatas"])
+    index.save(index_path)
+    return index
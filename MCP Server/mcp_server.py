@@ -1,12 +1,22 @@
 from fastmcp import FastMCP
-import pandas as pd
-from typing import List, Optional
-from math import radians, sin, cos, sqrt, atan2
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from typing import List, NamedTuple, Optional
 import os
+import asyncio
 import dotenv
-from langchain_chroma import Chroma
 import logging
+from langchain_chroma import Chroma
+from data_registry import DataRegistry, Reloadable
+from hospital_payload import DEFAULT_PAGE_SIZE, clamp_limit, decode_cursor, dumps, encode_cursor, hospital_records
+from query_cache import CachedEmbeddings, SemanticResultCache
+from embedding_providers import PERSIST_DIRECTORY, get_embedding_provider, open_vector_store
+from lexical_index import BM25Index
+from hybrid_search import hybrid_search
+from vector_snapshot import VECTOR_SNAPSHOT_DIR, VectorSnapshot
+from speciality_index import AmbiguousSpecialityError
+from mcp_telemetry import TelemetryMiddleware, metrics_payload, span
+from hospital_batch import batch_hospitals
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
 dotenv.load_dotenv()
 
@@ -14,79 +24,223 @@ logging.basicConfig(level=logging.INFO)
 
 # Create a basic server instance
 mcp = FastMCP(name="SevaHealth AI MCP Server")
+mcp.add_middleware(TelemetryMiddleware())
+
+SEARCH_RADIUS_KM = 10
+# Speciality care is sparser than general hospitals, so look further for it
+SPECIALITY_SEARCH_RADIUS_KM = 50
+
+MAX_DOCUMENT_RESULTS = 20
+FETCH_MULTIPLIER = 4
+LEXICAL_INDEX_PATH = os.path.join(PERSIST_DIRECTORY, "bm25_index.json")
+
+# Hospital, pincode and speciality data come from a memory-mapped snapshot that is
+# compiled once and shared by all worker processes; the registry swaps in a new
+# snapshot when the source files change
+registry = DataRegistry()
+registry.current()
+
+
+class SearchBackend(NamedTuple):
+    version: str
+    embeddings: CachedEmbeddings
+    # Exactly one of the two is set: the exported snapshot when present, else the Chroma collection
+    vector_snapshot: Optional[VectorSnapshot]
+    vector_store: Optional[Chroma]
+    lexical_index: Optional[BM25Index]
+
+
+def _search_index_version() -> str:
+    """Version id of the exported vector snapshot and BM25 index; both are replaced, never rewritten, on export."""
+    parts = []
+    for path in (os.path.join(VECTOR_SNAPSHOT_DIR, "meta.json"), LEXICAL_INDEX_PATH):
+        try:
+            stat = os.stat(path)
+            parts.append(f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append("missing")
+    return "|".join(parts)
+
+
+def _create_search_backend(previous: Optional[SearchBackend]) -> SearchBackend:
+    with span("search_backend_setup"):
+        version = _search_index_version()
+        embedding_provider = get_embedding_provider()
+        # The query embedding cache outlives reloads
+        if previous is not None:
+            embeddings = previous.embeddings
+        else:
+            embeddings = CachedEmbeddings(embedding_provider.embeddings, namespace=embedding_provider.model_id)
+
+        # The memory-mapped snapshot is searched in-process and shared by all workers,
+        # so Chroma is only opened when no snapshot has been exported
+        vector_snapshot, vector_store = None, None
+        if os.path.exists(os.path.join(VECTOR_SNAPSHOT_DIR, "meta.json")):
+            vector_snapshot = VectorSnapshot.load(VECTOR_SNAPSHOT_DIR)
+            vector_snapshot.check_provider(embedding_provider)
+            logging.info(f"Searching documents in the vector snapshot at {VECTOR_SNAPSHOT_DIR}")
+        elif previous is not None and previous.vector_store is not None:
+            vector_store = previous.vector_store
+        else:
+            vector_store = open_vector_store(embedding_provider, embedding_function=embeddings)
+
+        if os.path.exists(LEXICAL_INDEX_PATH):
+            lexical_index = BM25Index.load(LEXICAL_INDEX_PATH)
+        else:
+            logging.warning(f"No lexical index at {LEXICAL_INDEX_PATH}, run vectorization.py to build it")
+            lexical_index = None
+    return SearchBackend(version, embeddings, vector_snapshot, vector_store, lexical_index)
+
+
+# The vector store is opened on first use (the __main__ entry point does so before serving),
+# and reopened when vectorization.py exports a new vector snapshot or BM25 index
+search_backend = Reloadable(_create_search_backend, _search_index_version)
+result_cache = SemanticResultCache()
+
+def _hospital_page(pincode: int, radius_km: float, limit: int, fields: str, cursor: Optional[str],
+                   query: str, specialities: Optional[List[str]] = None) -> str:
+    limit = clamp_limit(limit)
+    offset = decode_cursor(cursor, query)
+    snapshot = registry.current()
+
+    coords = snapshot.pincode_table.lookup(pincode)
+    if coords is None:
+        logging.debug("No coordinates found for pincode: %s", pincode)
+        return dumps({"hospitals": [], "next_cursor": None, "error": f"Unknown pincode: {pincode}"})
+    lat, lon = coords
+    mask = snapshot.speciality_index.mask(specialities) if specialities else None
+
+    # Fetch one extra row to know whether another page exists
+    with span("hospital_index_query"):
+        row_ids, distances = snapshot.hospital_index.query(lat, lon, k=offset + limit + 1, radius_km=radius_km, mask=mask)
+    page_ids = row_ids[offset:offset + limit]
+    next_cursor = encode_cursor(offset + limit, query) if len(row_ids) > offset + limit else None
+
+    return dumps({
+        "radius_km": radius_km,
+        "hospitals": hospital_records(snapshot.hospitals_df, page_ids, distances[offset:offset + limit], fields),
+        "next_cursor": next_cursor,
+    })
 
-hospitals_df = pd.read_parquet("hospital_data_enriched.parquet")
-pincode_coords_df = pd.read_csv("india_pincodes.csv")
-
-embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001",
-                google_api_key=os.getenv("GOOGLE_API_KEY"))
+@mcp.tool
+async def find_hospitals(pincode: int, limit: int = DEFAULT_PAGE_SIZE, fields: str = "summary",
+                         cursor: Optional[str] = None) -> str:
+    """
+    Find the nearest hospitals within 10 km of a pincode.
 
-vector_store = Chroma(
-    collection_name="sevahealth_ai_docs",
-    embedding_function=embeddings,
-    persist_directory="./chroma_langchain_db",
-)
+    Args:
+        pincode (int): The pincode to search for hospitals.
+        limit (int): Number of hospitals to return (1-25).
+        fields (str): "summary" for name, location and contact, "detail" to add address,
+            specialities, email and coordinates.
+        cursor (Optional[str]): The next_cursor of a previous response, to get the next page.
+    Returns:
+        str: JSON with the hospitals nearest first, their distance_km, and next_cursor
+            (null when there are no more results).
+    """
+    return _hospital_page(pincode, SEARCH_RADIUS_KM, limit, fields, cursor, query=f"{pincode}")
 
 @mcp.tool
-async def find_hospitals(pincode: int) -> List[dict]:
+async def find_hospitals_by_speciality(pincode: int, speciality: str, limit: int = DEFAULT_PAGE_SIZE,
+                                       fields: str = "summary", cursor: Optional[str] = None) -> str:
     """
-    Find hospitals in a given pincode area.
+    Find the nearest hospitals offering a speciality within 50 km of a pincode.
 
     Args:
-        pincode (int): The pincode to search for hospitals.
+        pincode (int): The pincode to search around.
+        speciality (str): Speciality code such as "M7" or name such as "Cardiology". A partial
+            name that matches several specialities returns an error listing them.
+        limit (int): Number of hospitals to return (1-25).
+        fields (str): "summary" for name, location and contact, "detail" to add address,
+            specialities, email and coordinates.
+        cursor (Optional[str]): The next_cursor of a previous response, to get the next page.
     Returns:
-        List[dict]: A list of hospitals in the specified pincode area.
+        str: JSON with the hospitals nearest first, their distance_km, and next_cursor
+            (null when there are no more results).
     """
-    # first get the latitude and longitude for the pincode
-    coords = pincode_coords_df[pincode_coords_df["postal code "] == pincode]
-    if coords.empty:
-        logging.info(f"No coordinates found for pincode: {pincode}")
-        return []
-    lat = coords.iloc[0]["latitude"]
-    lon = coords.iloc[0]["longitude"]
-
-    logging.info(f"Coordinates for pincode {pincode}: lat={lat}, lon={lon}")
-
-    # now find hospitals within a certain radius (e.g., 10 km)
-    def haversine(lat1, lon1, lat2, lon2):
-
-        R = 6371.0  # Earth radius in kilometers
-
-        dlat = radians(lat2 - lat1)
-        dlon = radians(lon2 - lon1)
-        a = sin(dlat / 2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        distance = R * c
-        return distance
-    
-    nearby_hospitals = hospitals_df.copy()
-    nearby_hospitals["distance"] = nearby_hospitals.apply(
-        lambda row: haversine(lat, lon, row["latitude"], row["longitude"]), axis=1
-    )
-
-    # Filter hospitals within 10 km
-    nearby_hospitals = nearby_hospitals[nearby_hospitals["distance"] <= 10].head(10)
-
-    if nearby_hospitals.empty:
-        logging.info(f"No hospitals found within 10 km for pincode: {pincode}")
-        return []
-
-    return nearby_hospitals.to_dict(orient="records")
+    try:
+        codes = registry.current().speciality_index.resolve(speciality)
+    except AmbiguousSpecialityError as e:
+        return dumps({"hospitals": [], "next_cursor": None, "error": str(e), "candidates": e.candidates})
+    if not codes:
+        logging.debug("Unknown speciality: %s", speciality)
+        return dumps({"hospitals": [], "next_cursor": None, "error": f"Unknown speciality: {speciality}"})
+
+    return _hospital_page(pincode, SPECIALITY_SEARCH_RADIUS_KM, limit, fields, cursor,
+                          query=f"{pincode}:{'+'.join(codes)}", specialities=codes)
 
 @mcp.tool
-async def search_documents(query: str) -> List[dict]:
+async def search_documents(query: str, k: int = 5, sources: Optional[List[str]] = None) -> List[dict]:
     """
-    Search for documents related to the query using the vector store.
+    Search for documents related to the query using hybrid semantic and keyword search.
 
     Args:
         query (str): The search query.
+        k (int): Number of results to return (1-20).
+        sources (Optional[List[str]]): Only search these source documents (PDF file names).
 
     Returns:
         List[dict]: A list of documents matching the query.
     """
-    results = vector_store.similarity_search(query, k=5)
-    return [{"content": doc.page_content, "metadata": doc.metadata} for doc in results]
+    k = max(1, min(k, MAX_DOCUMENT_RESULTS))
+    fetch_k = k * FETCH_MULTIPLIER
+    backend = await asyncio.to_thread(search_backend.get)
+    # Results cached before a reload refer to the old chunks
+    partition = (backend.version, k, tuple(sorted(sources)) if sources else None)
+
+    with span("embedding"):
+        query_vector = await backend.embeddings.aembed_query(query)
+
+    results = result_cache.get(query_vector, partition=partition)
+    if results is None:
+        with span("vector_query"):
+            if backend.vector_snapshot is not None:
+                vector_hits = backend.vector_snapshot.search(query_vector, k=fetch_k, sources=sources)
+            else:
+                where = {"source": {"$in": list(sources)}} if sources else None
+                docs = backend.vector_store.similarity_search_by_vector(query_vector, k=fetch_k, filter=where)
+                vector_hits = [{"content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+        with span("hybrid_fusion"):
+            results = hybrid_search(query, vector_hits, backend.lexical_index, k=k, fetch_k=fetch_k, sources=sources)
+        result_cache.put(query_vector, results, partition=partition)
+
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Search cache stats: embeddings=%s, results=%s", backend.embeddings.stats(), result_cache.stats())
+    return results
+
+@mcp.custom_route("/hospitals/batch", methods=["POST"])
+async def hospitals_batch(request: Request) -> Response:
+    """
+    Batch hospital lookup for dashboards and call centres, streamed as NDJSON.
 
+    Takes `pincodes` or `points`, and optionally `radius_km`, `k`, `speciality` and
+    `fields`, as a JSON body and writes one line per pincode or point as soon as its
+    chunk of the batch is computed. This is deliberately not an MCP tool: the agent
+    binds every tool, and a batch result is far too large for a model's prompt.
+    """
+    try:
+        body = await request.json()
+        lines = batch_hospitals(
+            registry.current(),
+            pincodes=body.get("pincodes"),
+            points=body.get("points"),
+            radius_km=float(body.get("radius_km", SEARCH_RADIUS_KM)),
+            k=int(body.get("k", DEFAULT_PAGE_SIZE)),
+            speciality=body.get("speciality"),
+            fields=body.get("fields", "summary"),
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    # A plain generator is run in the threadpool, so the event loop stays free
+    return StreamingResponse((dumps(line) + "\n" for line in lines), media_type="application/x-ndjson")
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    payload, content_type = metrics_payload()
+    return Response(payload, media_type=content_type)
 
 if __name__ == "__main__":
+    # Open the search backend before serving, so a vector store or snapshot built with another
+    # embedding model stops startup instead of failing every search_documents call
+    search_backend.get()
     mcp.run(transport="streamable-http", host="0.0.0.0", stateless_http=True,port=8000)
\ No newline at end of file
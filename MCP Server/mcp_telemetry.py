@@ -0,0 +1,46 @@
+import os
+import sys
+from typing import Optional
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from prometheus_client import Counter
+
+# The stage timing shared with the chat server lives in ../Shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Shared"))
+from stage_telemetry import StageTelemetry, metrics_payload, request_id_var
+
+# From sub-millisecond index lookups up to slow embedding API calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+STAGES = StageTelemetry("mcp", "MCP server", STAGE_BUCKETS)
+observe, span = STAGES.observe, STAGES.span
+
+TOOL_CALLS = Counter("sevahealth_mcp_tool_calls_total", "Tool calls by tool and outcome", ["tool", "status"])
+
+
+class TelemetryMiddleware(Middleware):
+    """
+    Times every tool call and tags its spans with the caller's request id.
+
+    The chat server sends the id in the `_meta` field of the tools/call request.
+    """
+
+    @staticmethod
+    def _caller_request_id(context: MiddlewareContext) -> Optional[str]:
+        # fastmcp strips `_meta` from the tool call message and keeps it on the request context
+        request_context = context.fastmcp_context.request_context if context.fastmcp_context is not None else None
+        meta = request_context.meta if request_context is not None else None
+        return getattr(meta, "request_id", None) if meta is not None else None
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        tool = context.message.name
+        token = request_id_var.set(self._caller_request_id(context))
+        status = "error"
+        try:
+            with span(f"tool:{tool}"):
+                result = await call_next(context)
+            status = "ok"
+            return result
+        finally:
+            TOOL_CALLS.labels(tool, status).inc()
+            request_id_var.reset(token)
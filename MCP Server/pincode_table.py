@@ -0,0 +1,84 @@
+import os
+import numpy as np
+from typing import Optional, Tuple
+
+# Indian pincodes are six digits starting with 1-9, so a dense table covering
+# 100000..999999 gives every pincode a fixed slot.
+PINCODE_MIN = 100000
+PINCODE_MAX = 999999
+
+
+class PincodeTable:
+    """
+    Constant-time pincode -> (latitude, longitude) lookup.
+
+    Coordinates are stored in a dense float32 array indexed by `pincode - PINCODE_MIN`.
+    Pincodes served by several post offices are stored as the centroid of those offices,
+    unknown pincodes hold NaN. The table is persisted as a .npy file and memory-mapped
+    on load, so server startup doesn't parse the CSV.
+    """
+
+    def __init__(self, coords: np.ndarray):
+        self.coords = coords
+
+    @classmethod
+    def from_csv(cls, csv_path: str) -> "PincodeTable":
+        import pandas as pd
+
+        df = pd.read_csv(csv_path)
+        df.columns = df.columns.str.strip()
+        df = df.dropna(subset=["postal code", "latitude", "longitude"])
+        df["postal code"] = df["postal code"].astype(np.int64)
+        df = df[(df["postal code"] >= PINCODE_MIN) & (df["postal code"] <= PINCODE_MAX)]
+
+        centroids = df.groupby("postal code")[["latitude", "longitude"]].mean()
+
+        coords = np.full((PINCODE_MAX - PINCODE_MIN + 1, 2), np.nan, dtype=np.float32)
+        coords[centroids.index.to_numpy() - PINCODE_MIN] = centroids.to_numpy(dtype=np.float32)
+        return cls(coords)
+
+    @classmethod
+    def load(cls, table_path: str) -> "PincodeTable":
+        return cls(np.load(table_path, mmap_mode="r"))
+
+    def save(self, table_path: str) -> None:
+        # Write to a temporary file and swap it in so readers never see a partial table
+        tmp_path = f"{table_path}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(self.coords, dtype=np.float32))
+        os.replace(tmp_path, table_path)
+
+    def lookup(self, pincode: int) -> Optional[Tuple[float, float]]:
+        """
+        Resolve a pincode to its (latitude, longitude), or None if it is unknown.
+        """
+        if not PINCODE_MIN <= pincode <= PINCODE_MAX:
+            return None
+        lat, lon = self.coords[pincode - PINCODE_MIN]
+        if np.isnan(lat):
+            return None
+        return float(lat), float(lon)
+
+    def lookup_many(self, pincodes) -> np.ndarray:
+        """
+        Resolve many pincodes at once.
+
+        Returns:
+            A (n, 2) float array of (latitude, longitude), NaN for unknown pincodes.
+        """
+        pincodes = np.asarray(pincodes, dtype=np.int64)
+        coords = np.full((len(pincodes), 2), np.nan, dtype=np.float32)
+        known = (pincodes >= PINCODE_MIN) & (pincodes <= PINCODE_MAX)
+        coords[known] = self.coords[pincodes[known] - PINCODE_MIN]
+        return coords
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile india_pincodes.csv into a binary lookup table")
+    parser.add_argument("--csv", default="india_pincodes.csv")
+    parser.add_argument("--out", default="india_pincodes.npy")
+    args = parser.parse_args()
+
+    PincodeTable.from_csv(args.csv).save(args.out)
+    print(f"Pincode table saved to '{args.out}'")
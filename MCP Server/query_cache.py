@@ -0,0 +1,252 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Rows kept in the SQLite file; expired and then the oldest rows are deleted every PRUNE_EVERY_WRITES writes
+EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000"))
+PRUNE_EVERY_WRITES = 100
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_THRESHOLD = float(os.getenv("RESULT_CACHE_THRESHOLD", "0.97"))
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query used as the exact-match cache key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip(" ?.!")
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that memoizes query vectors.
+
+    Queries are normalized and looked up in an in-process LRU first, then in a SQLite
+    file shared by all workers, and only embedded remotely on a miss. The async path
+    reads and writes the SQLite file in a worker thread, so it never blocks the event
+    loop. The file holds at most `max_disk_size` rows. Document embedding is passed
+    straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, namespace: str,
+                 db_path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 max_size: int = EMBEDDING_CACHE_SIZE,
+                 ttl_seconds: float = EMBEDDING_CACHE_TTL_SECONDS,
+                 max_disk_size: int = EMBEDDING_CACHE_DISK_SIZE):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_size = max_disk_size
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "namespace TEXT, query TEXT, vector BLOB, created REAL, "
+                "PRIMARY KEY (namespace, query))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)")
+            self._db.commit()
+            self._prune()
+
+    def _get_memory(self, key: str) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                vector, created = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._memory[key]
+            if self._db is None:
+                self.misses += 1
+            return None
+
+    def _get_disk(self, key: str) -> Optional[List[float]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector, created FROM query_embeddings WHERE namespace = ? AND query = ?",
+                (self.namespace, key),
+            ).fetchone()
+        with self._lock:
+            if row is not None and time.time() - row[1] <= self.ttl_seconds:
+                vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                self._remember(key, vector, row[1])
+                self.disk_hits += 1
+                return vector
+            self.misses += 1
+            return None
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        vector = self._get_memory(key)
+        if vector is None and self._db is not None:
+            vector = self._get_disk(key)
+        return vector
+
+    async def _aget(self, key: str) -> Optional[List[float]]:
+        vector = self._get_memory(key)
+        if vector is None and self._db is not None:
+            vector = await asyncio.to_thread(self._get_disk, key)
+        return vector
+
+    def _remember(self, key: str, vector: List[float], created: float) -> None:
+        self._memory[key] = (vector, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _write_disk(self, key: str, vector: List[float], created: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                (self.namespace, key, np.asarray(vector, dtype=np.float32).tobytes(), created),
+            )
+            self._db.commit()
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY_WRITES == 0
+        if prune:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete expired rows, then the oldest rows beyond `max_disk_size`."""
+        with self._db_lock:
+            self._db.execute("DELETE FROM query_embeddings WHERE created < ?", (time.time() - self.ttl_seconds,))
+            excess = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0] - self.max_disk_size
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM query_embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM query_embeddings ORDER BY created LIMIT ?)",
+                    (excess,),
+                )
+            self._db.commit()
+
+    def _put(self, key: str, vector: List[float]) -> float:
+        created = time.time()
+        with self._lock:
+            self._remember(key, vector, created)
+        return created
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            created = self._put(key, vector)
+            if self._db is not None:
+                self._write_disk(key, vector, created)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = await self._aget(key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            created = self._put(key, vector)
+            if self._db is not None:
+                await asyncio.to_thread(self._write_disk, key, vector, created)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "disk_hits": self.disk_hits,
+                "misses": self.misses, "size": len(self._memory)}
+
+
+class SemanticResultCache:
+    """
+    Cache of search results keyed by query embedding.
+
+    A lookup hits when a cached query vector has cosine similarity of at least
+    `threshold` with the new one, so rephrasings of a frequent question reuse the
+    same results. Entries expire after `ttl_seconds` and the least recently used
+    entry is replaced once `max_entries` are stored. `partition` separates results
+    for different search parameters.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE,
+                 ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+                 threshold: float = RESULT_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._partitions: List[Hashable] = [None] * max_entries
+        self._results: List[Any] = [None] * max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, vector, partition: Hashable = None) -> Optional[Any]:
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(query):
+                self.misses += 1
+                return None
+            similarities = self._vectors @ query
+            live = self._expires > now
+            similarities[~live] = -1.0
+            candidates = [slot for slot in np.flatnonzero(similarities >= self.threshold)
+                          if self._partitions[slot] == partition]
+            if not candidates:
+                self.misses += 1
+                return None
+            # Prefer the closest matching entry within the partition
+            slot = max(candidates, key=lambda s: similarities[s])
+            self._last_used[slot] = now
+            self.hits += 1
+            return self._results[slot]
+
+    def put(self, vector, results: Any, partition: Hashable = None) -> None:
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(query):
+                self._vectors = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+                self._expires[:] = 0
+            expired = np.flatnonzero(self._expires <= now)
+            slot = expired[0] if len(expired) else int(np.argmin(self._last_used))
+            self._vectors[slot] = query
+            self._expires[slot] = now + self.ttl_seconds
+            self._last_used[slot] = now
+            self._partitions[slot] = partition
+            self._results[slot] = results
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses,
+                "size": int(np.count_nonzero(self._expires > time.time()))}
@@ -0,0 +1,240 @@
+import os
+import json
+import numpy as np
+from typing import List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.195
+# query_many groups points by blocks of GROUP_CELLS x GROUP_CELLS grid cells, and
+# computes at most MAX_MATRIX_SIZE point-to-hospital distances at once
+GROUP_CELLS = 4
+MAX_MATRIX_SIZE = 4_000_000
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Vectorized haversine distance. All arguments are in radians and broadcast
+    against each other, so this works for one-to-many and many-to-many queries.
+    """
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class HospitalIndex:
+    """
+    Grid bucket index over hospital coordinates.
+
+    Hospitals are bucketed into cells of `cell_deg` degrees. A query only looks at
+    the cells overlapping the search radius and computes exact haversine distances
+    for the candidates in those cells, so lookups stay cheap regardless of how many
+    hospitals the state has.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_deg: float = 0.1):
+        lat = np.asarray(latitudes, dtype=np.float32)
+        lon = np.asarray(longitudes, dtype=np.float32)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+
+        self.cell_deg = cell_deg
+        self.size = len(lat)
+
+        rows = np.flatnonzero(valid).astype(np.int32)
+        cell_lat = np.floor(lat[valid] / cell_deg).astype(np.int32)
+        cell_lon = np.floor(lon[valid] / cell_deg).astype(np.int32)
+
+        # Sort hospitals by cell so every cell is a contiguous slice
+        order = np.lexsort((cell_lon, cell_lat))
+        self.row_ids = rows[order]
+        self.lat_rad = np.radians(lat[valid][order]).astype(np.float32)
+        self.lon_rad = np.radians(lon[valid][order]).astype(np.float32)
+
+        cell_lat = cell_lat[order]
+        cell_lon = cell_lon[order]
+        boundaries = np.flatnonzero((np.diff(cell_lat) != 0) | (np.diff(cell_lon) != 0)) + 1
+        starts = np.concatenate(([0], boundaries)).astype(np.int64)
+        ends = np.concatenate((boundaries, [len(order)])).astype(np.int64)
+        self._cells = {
+            (int(cell_lat[s]), int(cell_lon[s])): (int(s), int(e))
+            for s, e in zip(starts, ends)
+        }
+
+    def save(self, directory: str) -> None:
+        """Persist the index arrays as .npy files so they can be memory-mapped by `load`."""
+        cells = np.array([(i, j, s, e) for (i, j), (s, e) in self._cells.items()], dtype=np.int64).reshape(-1, 4)
+        np.save(os.path.join(directory, "index_row_ids.npy"), self.row_ids)
+        np.save(os.path.join(directory, "index_lat_rad.npy"), self.lat_rad)
+        np.save(os.path.join(directory, "index_lon_rad.npy"), self.lon_rad)
+        np.save(os.path.join(directory, "index_cells.npy"), cells)
+        with open(os.path.join(directory, "index_meta.json"), "w") as file:
+            json.dump({"cell_deg": self.cell_deg, "size": self.size}, file)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "HospitalIndex":
+        index = cls.__new__(cls)
+        with open(os.path.join(directory, "index_meta.json")) as file:
+            meta = json.load(file)
+        index.cell_deg = meta["cell_deg"]
+        index.size = meta["size"]
+        index.row_ids = np.load(os.path.join(directory, "index_row_ids.npy"), mmap_mode=mmap_mode)
+        index.lat_rad = np.load(os.path.join(directory, "index_lat_rad.npy"), mmap_mode=mmap_mode)
+        index.lon_rad = np.load(os.path.join(directory, "index_lon_rad.npy"), mmap_mode=mmap_mode)
+        cells = np.load(os.path.join(directory, "index_cells.npy"))
+        index._cells = {(int(i), int(j)): (int(s), int(e)) for i, j, s, e in cells}
+        return index
+
+    def __len__(self) -> int:
+        return len(self.row_ids)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Positions (into the sorted arrays) of hospitals in cells overlapping the radius."""
+        return self._candidates_box(lat, lat, lon, lon, radius_km)
+
+    def _candidates_box(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                        radius_km: float) -> np.ndarray:
+        """Positions of hospitals in cells overlapping the radius around any point of a box, in ascending order."""
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = max(np.cos(np.radians(max(abs(lat_min), abs(lat_max)))), 1e-6)
+        dlon = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+
+        lat_lo = int(np.floor((lat_min - dlat) / self.cell_deg))
+        lat_hi = int(np.floor((lat_max + dlat) / self.cell_deg))
+        lon_lo = int(np.floor((lon_min - dlon) / self.cell_deg))
+        lon_hi = int(np.floor((lon_max + dlon) / self.cell_deg))
+
+        if (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) > len(self._cells):
+            return np.arange(len(self.row_ids))
+
+        slices = []
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(lon_lo, lon_hi + 1):
+                bounds = self._cells.get((i, j))
+                if bounds is not None:
+                    slices.append(np.arange(*bounds))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def _ranked(self, positions: np.ndarray, lat: float, lon: float, radius_km: float,
+                mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        if mask is not None:
+            positions = positions[mask[self.row_ids[positions]]]
+        distances = haversine_km(np.radians(lat), np.radians(lon),
+                                 self.lat_rad[positions], self.lon_rad[positions])
+        within = distances <= radius_km
+        positions = positions[within]
+        distances = distances[within]
+        order = np.argsort(distances, kind="stable")
+        return self.row_ids[positions[order]], distances[order]
+
+    def query_radius(self, lat: float, lon: float, radius_km: float,
+                     mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find all hospitals within `radius_km` of a point.
+
+        Args:
+            mask: Optional boolean array over the source frame rows; only rows set are returned.
+
+        Returns:
+            (row_ids, distances_km) sorted by distance, row_ids index the source frame.
+        """
+        positions = self._candidates(lat, lon, radius_km)
+        return self._ranked(positions, lat, lon, radius_km, mask)
+
+    def query(self, lat: float, lon: float, k: int, radius_km: Optional[float] = None,
+              mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest hospitals to a point, optionally limited to `radius_km`.
+
+        Args:
+            mask: Optional boolean array over the source frame rows; only rows set are returned.
+
+        Returns:
+            (row_ids, distances_km) sorted by distance, row_ids index the source frame.
+        """
+        if k <= 0 or len(self.row_ids) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        if radius_km is not None:
+            row_ids, distances = self.query_radius(lat, lon, radius_km, mask)
+            return row_ids[:k], distances[:k]
+
+        # Grow the search ring until it holds k hospitals. Every hospital within the
+        # ring radius is a candidate, so the first k of them are the true nearest.
+        search_km = self.cell_deg * KM_PER_DEGREE
+        while True:
+            positions = self._candidates(lat, lon, search_km)
+            if len(positions) == len(self.row_ids):
+                row_ids, distances = self._ranked(positions, lat, lon, np.inf, mask)
+                return row_ids[:k], distances[:k]
+            row_ids, distances = self._ranked(positions, lat, lon, search_km, mask)
+            if len(row_ids) >= k:
+                return row_ids[:k], distances[:k]
+            search_km *= 2
+
+    def query_many(self, lats, lons, k: int, radius_km: float, mask: Optional[np.ndarray] = None,
+                   max_matrix_size: int = MAX_MATRIX_SIZE) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the k nearest hospitals within `radius_km` of each of many points.
+
+        Points are grouped by blocks of grid cells. Each group shares one candidate
+        set, and the distances from all its points to all its candidates are computed
+        as one matrix, in chunks of at most `max_matrix_size` entries. Results match
+        `query` for every point, including the order of hospitals at equal distance.
+
+        Args:
+            lats, lons: Point coordinates in degrees; NaN marks a point without coordinates.
+            mask: Optional boolean array over the source frame rows; only rows set are returned.
+
+        Returns:
+            One (row_ids, distances_km) pair per point, in input order, each sorted by distance.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+        results = [empty] * len(lats)
+        points = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if k <= 0 or len(self.row_ids) == 0 or len(points) == 0:
+            return results
+
+        group_deg = GROUP_CELLS * self.cell_deg
+        group_lat = np.floor(lats[points] / group_deg).astype(np.int64)
+        group_lon = np.floor(lons[points] / group_deg).astype(np.int64)
+        order = np.lexsort((group_lon, group_lat))
+        points, group_lat, group_lon = points[order], group_lat[order], group_lon[order]
+        boundaries = np.flatnonzero((np.diff(group_lat) != 0) | (np.diff(group_lon) != 0)) + 1
+
+        for group in np.split(points, boundaries):
+            positions = self._candidates_box(lats[group].min(), lats[group].max(),
+                                             lons[group].min(), lons[group].max(), radius_km)
+            if mask is not None:
+                positions = positions[mask[self.row_ids[positions]]]
+            if len(positions) == 0:
+                continue
+            candidate_lat = self.lat_rad[positions][np.newaxis, :]
+            candidate_lon = self.lon_rad[positions][np.newaxis, :]
+            top_k = min(k, len(positions))
+
+            rows_per_chunk = max(1, max_matrix_size // len(positions))
+            for start in range(0, len(group), rows_per_chunk):
+                chunk = group[start:start + rows_per_chunk]
+                distances = haversine_km(np.radians(lats[chunk])[:, np.newaxis], np.radians(lons[chunk])[:, np.newaxis],
+                                         candidate_lat, candidate_lon)
+                distances[distances > radius_km] = np.inf
+                # Distance of the k-th nearest per point. Everything up to it is kept, so
+                # hospitals tied at that distance are ranked by position, like the stable
+                # sort in `query`.
+                if top_k < len(positions):
+                    limits = np.partition(distances, top_k - 1, axis=1)[:, top_k - 1]
+                else:
+                    limits = np.full(len(chunk), np.inf)
+
+                for row_distances, limit, point in zip(distances, limits, chunk):
+                    columns = np.flatnonzero(row_distances <= limit)
+                    column_distances = row_distances[columns]
+                    within = np.isfinite(column_distances)
+                    columns, column_distances = columns[within], column_distances[within]
+                    ranked = np.lexsort((columns, column_distances))[:top_k]
+                    results[point] = (self.row_ids[positions[columns[ranked]]], column_distances[ranked])
+        return results
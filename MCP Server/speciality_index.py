@@ -0,0 +1,145 @@
+import os
+import re
+import json
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+SPECIALITIES = {
+    "S1": "General Surgery",
+    "S2": "ENT",
+    "S3": "Ophthalmology Surgery",
+    "S4": "Gynaecology And Obstetrics Surgery",
+    "S5": "Orthopedic Surgery And Procedures",
+    "S6": "Surgical Gastroenterology",
+    "S7": "Cardiac And Cardiothoracic Surgery",
+    "S8": "Pediatric Surgery",
+    "S9": "Urology",
+    "S10": "Neurosurgery",
+    "S11": "Surgical Oncology",
+    "S12": "Plastic Surgery",
+    "S13": "Burns",
+    "S14": "Polytrauma",
+    "S15": "Prosthesis and Orthosis",
+    "S16": "Maxillofacial Surgery",
+    "S20": "Maxillofacial Surgery",
+    "S21": "Pediatric Cancer",
+    "M1": "Medical Oncology",
+    "M2": "Radiation Oncology",
+    "M3": "Critical Care",
+    "M5": "Infectious diseases",
+    "M6": "Neonatal and Pediatric Medical Management",
+    "M7": "Cardiology",
+    "M8": "Nephrology",
+    "M9": "Neurology",
+    "M10": "Pulmonology",
+    "M11": "Dermatology",
+    "M12": "Rheumatology",
+    "M13": "Endocrinology",
+    "M14": "Medical Gastroenterology",
+    "M15": "Interventional Radiology",
+    "M16": "General Medicine",
+    "M17": "Mental Health Packages",
+    "M18": "Haematology",
+    "M19": "Haemato Oncology",
+    "M20": "Physiotherapy",
+}
+
+CODE_PATTERN = re.compile(r"\b([SM]\d{1,2})\b", re.IGNORECASE)
+_CODES_BY_NAME: Dict[str, List[str]] = {}
+for _code, _name in SPECIALITIES.items():
+    _CODES_BY_NAME.setdefault(_name.casefold(), []).append(_code)
+
+
+class AmbiguousSpecialityError(ValueError):
+    """Raised when a partial speciality name matches several specialities; `candidates` maps their codes to names."""
+
+    def __init__(self, speciality: str, candidates: Dict[str, str]):
+        names = sorted(set(candidates.values()))
+        super().__init__(f"Speciality '{speciality}' matches several specialities: {', '.join(names)}")
+        self.candidates = candidates
+
+
+def parse_specialities(text: Optional[str]) -> List[str]:
+    """
+    Extract speciality codes from a hospital's comma-joined `Specialties` string.
+
+    Entries may carry the code ("M7 Cardiology") or only the name ("Cardiology").
+    """
+    if not isinstance(text, str) or not text:
+        return []
+    codes = []
+    for entry in text.split(","):
+        match = CODE_PATTERN.search(entry)
+        if match and match.group(1).upper() in SPECIALITIES:
+            codes.append(match.group(1).upper())
+        else:
+            codes.extend(_CODES_BY_NAME.get(entry.strip().casefold(), []))
+    return codes
+
+
+class SpecialityIndex:
+    """
+    Inverted index from speciality code to the hospitals offering it.
+
+    Each code maps to a boolean mask over the hospital rows, which can be passed
+    straight to `HospitalIndex.query` to restrict a nearest-hospital search.
+    """
+
+    def __init__(self, masks: Dict[str, np.ndarray]):
+        self.masks = masks
+
+    @classmethod
+    def from_specialities(cls, specialities: Iterable[Optional[str]]) -> "SpecialityIndex":
+        specialities = list(specialities)
+        masks = {code: np.zeros(len(specialities), dtype=bool) for code in SPECIALITIES}
+        for row, text in enumerate(specialities):
+            for code in parse_specialities(text):
+                masks[code][row] = True
+        return cls(masks)
+
+    def save(self, directory: str) -> None:
+        codes = list(self.masks)
+        np.save(os.path.join(directory, "speciality_masks.npy"), np.stack([self.masks[code] for code in codes]))
+        with open(os.path.join(directory, "speciality_codes.json"), "w") as file:
+            json.dump(codes, file)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "SpecialityIndex":
+        with open(os.path.join(directory, "speciality_codes.json")) as file:
+            codes = json.load(file)
+        masks = np.load(os.path.join(directory, "speciality_masks.npy"), mmap_mode=mmap_mode)
+        return cls(dict(zip(codes, masks)))
+
+    def resolve(self, speciality: str) -> List[str]:
+        """
+        Map a speciality code ("m7"), name ("cardiology") or part of a name ("cardiolog") to its codes.
+
+        A name resolves to every code listed under it, e.g. both codes of
+        "Maxillofacial Surgery".
+
+        Returns:
+            The codes, or an empty list for an unknown speciality.
+
+        Raises:
+            AmbiguousSpecialityError: If a partial name matches several specialities.
+        """
+        speciality = speciality.strip()
+        if speciality.upper() in SPECIALITIES:
+            return [speciality.upper()]
+        match = CODE_PATTERN.match(speciality)
+        if match and match.group(1).upper() in SPECIALITIES:
+            return [match.group(1).upper()]
+        query = speciality.casefold()
+        if not query:
+            return []
+        if query in _CODES_BY_NAME:
+            return list(_CODES_BY_NAME[query])
+        candidates = {code: name for code, name in SPECIALITIES.items() if query in name.casefold()}
+        if len(set(candidates.values())) > 1:
+            raise AmbiguousSpecialityError(speciality, candidates)
+        return list(candidates)
+
+    def mask(self, codes: Iterable[str]) -> np.ndarray:
+        """Hospitals offering any of the codes."""
+        return np.logical_or.reduce([self.masks[code] for code in codes])
@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+
+from fastmcp import Client, FastMCP
+
+import mcp_telemetry
+from mcp_telemetry import TelemetryMiddleware
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Chat Server"))
+import chat_telemetry
+import stage_telemetry
+from chat_telemetry import RequestIdSession
+
+
+def test_tool_spans_carry_the_chat_request_id(monkeypatch, caplog):
+    monkeypatch.setattr(stage_telemetry, "TRACE_SPANS", True)
+    server = FastMCP(name="telemetry-test")
+    server.add_middleware(TelemetryMiddleware())
+    seen = []
+
+    @server.tool
+    def echo(text: str) -> str:
+        seen.append(mcp_telemetry.request_id_var.get())
+        return text
+
+    async def call():
+        async with Client(server) as client:
+            chat_telemetry.request_id_var.set("req-123")
+            return await RequestIdSession(client.session).call_tool("echo", {"text": "hi"})
+
+    with caplog.at_level(logging.INFO, logger="telemetry"):
+        result = asyncio.run(call())
+
+    assert not result.isError
+    assert seen == ["req-123"]
+    spans = [json.loads(record.getMessage()) for record in caplog.records if record.name == "telemetry"]
+    assert {"request_id": "req-123", "stage": "tool:echo", "status": "ok"}.items() <= spans[-1].items()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from spatial_index import HospitalIndex
+
+
+@pytest.fixture
+def tied_index():
+    """Hospitals clustered on a few shared coordinates, so most distances tie exactly."""
+    rng = np.random.default_rng(7)
+    sites = np.column_stack([rng.uniform(18.0, 19.0, 20), rng.uniform(73.0, 74.0, 20)])
+    # Several hospitals per site, and sites on cell boundaries
+    sites[:5] = [[18.5, 73.5], [18.6, 73.5], [18.5, 73.6], [18.7, 73.7], [18.3, 73.2]]
+    coords = sites[rng.integers(0, len(sites), 400)]
+    lats, lons = coords[:, 0], coords[:, 1]
+    # Rows without coordinates are skipped by the index
+    lats[::37] = np.nan
+    return HospitalIndex(lats, lons, cell_deg=0.1), coords
+
+
+def query_points(coords, rng):
+    near = coords[rng.integers(0, len(coords), 150)] + rng.normal(0, 0.02, (150, 2))
+    # Points sitting exactly on hospital sites tie at distance zero
+    exact = coords[rng.integers(0, len(coords), 50)]
+    points = np.vstack([near, exact, [[np.nan, np.nan], [25.0, 80.0]]])
+    return points[:, 0], points[:, 1]
+
+
+def assert_matches_query(index, lats, lons, results, k, radius_km, mask=None):
+    assert len(results) == len(lats)
+    for lat, lon, (row_ids, distances) in zip(lats, lons, results):
+        if np.isnan(lat):
+            assert len(row_ids) == 0
+            continue
+        expected_ids, expected_distances = index.query(lat, lon, k=k, radius_km=radius_km, mask=mask)
+        np.testing.assert_array_equal(row_ids, expected_ids)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-6)
+
+
+@pytest.mark.parametrize("k", [1, 4, 9, 15])
+@pytest.mark.parametrize("radius_km", [2.0, 15.0, 100.0])
+def test_query_many_matches_query_including_ties(tied_index, k, radius_km):
+    index, coords = tied_index
+    lats, lons = query_points(coords, np.random.default_rng(k))
+
+    results = index.query_many(lats, lons, k=k, radius_km=radius_km)
+
+    assert_matches_query(index, lats, lons, results, k, radius_km)
+    # For some points, hospitals tied with the k-th nearest are left out of the result
+    assert any(
+        len(row_ids) == k and index.query_radius(lat, lon, radius_km)[1][k:k + 1].tolist() == [distances[-1]]
+        for lat, lon, (row_ids, distances) in zip(lats, lons, results)
+    )
+
+
+def test_query_many_matches_query_with_mask_and_small_matrices(tied_index):
+    index, coords = tied_index
+    lats, lons = query_points(coords, np.random.default_rng(1))
+    mask = np.random.default_rng(2).random(len(coords)) < 0.5
+
+    results = index.query_many(lats, lons, k=5, radius_km=20.0, mask=mask, max_matrix_size=50)
+
+    assert_matches_query(index, lats, lons, results, 5, 20.0, mask=mask)
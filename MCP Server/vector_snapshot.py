@@ -0,0 +1,208 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from embedding_providers import PERSIST_DIRECTORY, EmbeddingMismatchError, EmbeddingProvider
+
+VECTOR_SNAPSHOT_DIR = os.getenv("VECTOR_SNAPSHOT_DIR", os.path.join(PERSIST_DIRECTORY, "vector_snapshot"))
+# Store the vectors as int8 with one scale per row: a quarter of the memory, slightly approximate scores
+VECTOR_SNAPSHOT_INT8 = os.getenv("VECTOR_SNAPSHOT_INT8", "0") == "1"
+
+EXPORT_PAGE_SIZE = 5000
+# Rows of the matrix scored at once. An int8 block is converted to float32 for scoring,
+# so this bounds that copy per search (2048 x 3072 dims is 24 MB)
+SEARCH_BLOCK_ROWS = 2048
+
+
+def _quantize(vectors: np.ndarray) -> tuple:
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def export_vector_snapshot(vector_store, provider: EmbeddingProvider, directory: str = VECTOR_SNAPSHOT_DIR,
+                           quantize: bool = VECTOR_SNAPSHOT_INT8) -> int:
+    """
+    Copy every chunk of the collection into a memory-mappable snapshot.
+
+    The embeddings go into one contiguous matrix (.npy), the chunk texts and
+    metadata into a JSON sidecar. The snapshot is written to a temporary directory
+    and swapped into place, so readers never see a partial one.
+
+    Returns:
+        The number of chunks exported.
+    """
+    collection = vector_store._collection
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+
+    ids, documents, metadatas, pages = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=EXPORT_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    dimension = pages[0].shape[1] if pages else (provider.dimension or 0)
+    vectors = np.concatenate(pages) if pages else np.empty((0, dimension), dtype=np.float32)
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".vector-snapshot-", dir=parent)
+    try:
+        if quantize:
+            quantized, scales = _quantize(vectors)
+            np.save(os.path.join(tmp_dir, "vectors_int8.npy"), quantized)
+            np.save(os.path.join(tmp_dir, "scales.npy"), scales)
+        else:
+            np.save(os.path.join(tmp_dir, "vectors.npy"), np.ascontiguousarray(vectors))
+        np.save(os.path.join(tmp_dir, "sq_norms.npy"), np.einsum("ij,ij->i", vectors, vectors).astype(np.float32))
+        with open(os.path.join(tmp_dir, "chunks.json"), "w", encoding="utf-8") as file:
+            json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, file, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as file:
+            json.dump({
+                "embedding_model": provider.model_id,
+                "dimension": int(dimension),
+                "count": len(ids),
+                "space": space,
+                "quantized": quantize,
+            }, file)
+
+        old_dir = None
+        if os.path.exists(directory):
+            old_dir = tempfile.mkdtemp(prefix=".vector-snapshot-old-", dir=parent)
+            os.rename(directory, os.path.join(old_dir, "snapshot"))
+        os.rename(tmp_dir, directory)
+        if old_dir is not None:
+            # Processes that still map the old files keep their view of them
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    logging.info(f"Exported {len(ids)} chunks to vector snapshot '{directory}'")
+    return len(ids)
+
+
+class VectorSnapshot:
+    """
+    Exact nearest-neighbour search over an exported, memory-mapped embedding matrix.
+
+    All worker processes map the same files, so the matrix is held in memory once.
+    Scores follow the collection's distance function, which keeps the ranking
+    identical to Chroma's for the float32 snapshot.
+    """
+
+    def __init__(self, meta: dict, vectors: np.ndarray, scales: Optional[np.ndarray], sq_norms: np.ndarray,
+                 documents: List[str], metadatas: List[dict]):
+        self.meta = meta
+        self.vectors = vectors
+        self.scales = scales
+        self.sq_norms = sq_norms
+        self.documents = documents
+        self.metadatas = metadatas
+        self.space = meta.get("space", "l2")
+        self._sources = np.array([(metadata or {}).get("source", "") for metadata in metadatas], dtype=object)
+
+    @classmethod
+    def load(cls, directory: str = VECTOR_SNAPSHOT_DIR, mmap_mode: Optional[str] = "r") -> "VectorSnapshot":
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        with open(os.path.join(directory, "chunks.json"), encoding="utf-8") as file:
+            chunks = json.load(file)
+        if meta.get("quantized"):
+            vectors = np.load(os.path.join(directory, "vectors_int8.npy"), mmap_mode=mmap_mode)
+            scales = np.load(os.path.join(directory, "scales.npy"), mmap_mode=mmap_mode)
+        else:
+            vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mmap_mode)
+            scales = None
+        sq_norms = np.load(os.path.join(directory, "sq_norms.npy"), mmap_mode=mmap_mode)
+        return cls(meta, vectors, scales, sq_norms, chunks["documents"], chunks["metadatas"])
+
+    def check_provider(self, provider: EmbeddingProvider) -> None:
+        """
+        Raises:
+            EmbeddingMismatchError: If the snapshot was exported from a collection built with another model.
+        """
+        if self.meta.get("embedding_model") != provider.model_id:
+            raise EmbeddingMismatchError(
+                f"Vector snapshot was built with {self.meta.get('embedding_model')}, "
+                f"but the configured embedding model is {provider.model_id}"
+            )
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _distances(self, queries: np.ndarray, start: int, end: int) -> np.ndarray:
+        block = self.vectors[start:end]
+        if self.scales is not None:
+            dots = (queries @ block.astype(np.float32).T) * self.scales[start:end]
+        else:
+            dots = queries @ block.T
+        if self.space == "cosine":
+            norms = np.sqrt(self.sq_norms[start:end]) * np.linalg.norm(queries, axis=1)[:, np.newaxis]
+            return 1.0 - dots / np.maximum(norms, 1e-12)
+        if self.space == "ip":
+            return 1.0 - dots
+        return np.einsum("ij,ij->i", queries, queries)[:, np.newaxis] - 2 * dots + self.sq_norms[start:end]
+
+    def search_many(self, queries: Sequence[Sequence[float]], k: int,
+                    sources: Optional[Iterable[str]] = None) -> List[List[dict]]:
+        """
+        Find the k nearest chunks for each of several query vectors in one pass over the matrix.
+
+        Args:
+            queries: Query embeddings.
+            k: Number of chunks per query.
+            sources: Only return chunks from these source documents.
+
+        Returns:
+            Per query, hits like Chroma's {"content", "metadata"}, nearest first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        allowed = np.isin(self._sources, list(sources)) if sources else None
+
+        distances = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, len(self))
+            distances[:, start:end] = self._distances(queries, start, end)
+        if allowed is not None:
+            distances[:, ~allowed] = np.inf
+
+        k = min(k, len(self))
+        results = []
+        for row in distances:
+            nearest = np.argpartition(row, k - 1)[:k] if 0 < k < len(row) else np.arange(k)
+            nearest = nearest[np.argsort(row[nearest], kind="stable")]
+            results.append([
+                {"content": self.documents[i], "metadata": self.metadatas[i]}
+                for i in nearest if np.isfinite(row[i])
+            ])
+        return results
+
+    def search(self, query: Sequence[float], k: int, sources: Optional[Iterable[str]] = None) -> List[dict]:
+        return self.search_many([query], k, sources)[0]
+
+
+if __name__ == "__main__":
+    import argparse
+    from embedding_providers import get_embedding_provider, open_vector_store
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the document collection to a memory-mapped vector snapshot")
+    parser.add_argument("--out", default=VECTOR_SNAPSHOT_DIR)
+    parser.add_argument("--int8", action="store_true", default=VECTOR_SNAPSHOT_INT8,
+                        help="Store int8-quantized vectors")
+    args = parser.parse_args()
+
+    provider = get_embedding_provider()
+    count = export_vector_snapshot(open_vector_store(provider), provider, args.out, quantize=args.int8)
+    print(f"Exported {count} chunks to '{args.out}'")
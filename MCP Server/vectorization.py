@@ -1,56 +1,233 @@
 import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
 from PyPDF2 import PdfReader
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
 import dotenv
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from embedding_providers import PERSIST_DIRECTORY, get_embedding_provider, open_vector_store
+from lexical_index import build_lexical_index
+from vector_snapshot import export_vector_snapshot
 
 dotenv.load_dotenv()
 
-def read_pdfs_from_directory(directory_path):
-    documents = []
-    for filename in os.listdir(directory_path):
-        if filename.endswith('.pdf'):
-            filepath = os.path.join(directory_path, filename)
-            reader = PdfReader(filepath)
-            text = ''
-            for page in reader.pages:
-                text += page.extract_text()
-            documents.append({'content': text, 'metadata': {'source': filename}})
-    return documents
-
-embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001",
-                google_api_key=os.getenv("GOOGLE_API_KEY"))
-
-vector_store = Chroma(
-    collection_name="sevahealth_ai_docs",
-    embedding_function=embeddings,
-    persist_directory="./chroma_langchain_db",
-)
-
-# Directory containing PDFs
-pdf_directory = 'PDFs'  # Replace with actual path
-
-# Read PDFs
-docs = read_pdfs_from_directory(pdf_directory)
-
-# Initialize embeddings
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-
-# Split documents into chunks
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=2048,
-    chunk_overlap=200)
-
-chunked_docs = []
-for doc in docs:
-    splits = text_splitter.split_text(doc['content'])
-    for i, chunk in enumerate(splits):
-        chunked_docs.append(Document(
-            page_content=chunk,
-            metadata={'source': doc['metadata']['source'], 'chunk': i}
-        ))
-
-# Add documents to vector store
-vector_store.add_documents(chunked_docs)
\ No newline at end of file
+logging.basicConfig(level=logging.INFO)
+
+PDF_DIRECTORY = 'PDFs'
+MANIFEST_PATH = os.path.join(PERSIST_DIRECTORY, "ingest_manifest.json")
+LEXICAL_INDEX_PATH = os.path.join(PERSIST_DIRECTORY, "bm25_index.json")
+
+EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "5"))
+
+
+def file_sha256(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pdf_text(filepath: str) -> str:
+    """Extract the text of a PDF. Runs in a worker process."""
+    reader = PdfReader(filepath)
+    return ''.join(page.extract_text() or '' for page in reader.pages)
+
+
+def load_manifest(manifest_path: str = MANIFEST_PATH) -> Dict[str, dict]:
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_manifest(manifest: Dict[str, dict], manifest_path: str = MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_changes(directory_path: str, manifest: Dict[str, dict]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Compare the PDFs on disk with the manifest.
+
+    Returns:
+        (changed, removed): content hashes of new or modified PDFs keyed by filename,
+        and the filenames that are in the manifest but no longer on disk.
+    """
+    current = {
+        filename: file_sha256(os.path.join(directory_path, filename))
+        for filename in sorted(os.listdir(directory_path))
+        if filename.endswith('.pdf')
+    }
+    changed = {
+        filename: sha for filename, sha in current.items()
+        if manifest.get(filename, {}).get('sha256') != sha
+    }
+    removed = [filename for filename in manifest if filename not in current]
+    return changed, removed
+
+
+def read_pdfs_from_directory(directory_path: str, filenames: Iterable[str],
+                             workers: int = EXTRACT_WORKERS) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Yield (filename, text) for each PDF, extracting them in parallel worker processes.
+
+    The text is None for a PDF that could not be read, so one broken file does not
+    stop the others. At most two PDFs per worker are being extracted or waiting to
+    be consumed at any time, so memory stays bounded however many PDFs there are.
+    """
+    filenames = iter(filenames)
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit_next() -> None:
+            filename = next(filenames, None)
+            if filename is not None:
+                pending.append((filename, executor.submit(extract_pdf_text, os.path.join(directory_path, filename))))
+
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            filename, future = pending.popleft()
+            submit_next()
+            try:
+                text = future.result()
+            except Exception as e:
+                logging.error(f"Failed to extract text from {filename}: {e}")
+                text = None
+            del future
+            yield filename, text
+
+
+def iter_chunks(documents: Iterable[Tuple[str, str]],
+                text_splitter: RecursiveCharacterTextSplitter) -> Iterator[Tuple[str, Document]]:
+    """Yield (chunk_id, Document) pairs one at a time. Chunk ids are stable per source and position."""
+    for filename, text in documents:
+        for i, chunk in enumerate(text_splitter.split_text(text)):
+            yield f"{filename}:{i}", Document(
+                page_content=chunk,
+                metadata={'source': filename, 'chunk': i}
+            )
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def add_batch_with_retry(vector_store: Chroma, batch: List[Tuple[str, Document]],
+                         max_retries: int = EMBED_MAX_RETRIES) -> None:
+    ids = [chunk_id for chunk_id, _ in batch]
+    docs = [doc for _, doc in batch]
+    for attempt in range(max_retries + 1):
+        try:
+            vector_store.add_documents(docs, ids=ids)
+            return
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = min(60, 2 ** attempt) * random.uniform(0.5, 1.5)
+            logging.warning(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def ingest(vector_store: Chroma, directory_path: str = PDF_DIRECTORY,
+           manifest_path: str = MANIFEST_PATH) -> None:
+    """
+    Incrementally sync the vector store with the PDFs in `directory_path`.
+
+    Only new or modified PDFs are extracted and embedded. Chunks of deleted PDFs are
+    removed first, and those of a modified PDF once its new text is ready to be
+    added, so a PDF that fails to extract keeps its previous chunks. Chunks are
+    streamed to the vector store in batches, with a bounded number of batches
+    embedding concurrently.
+    """
+    manifest = load_manifest(manifest_path)
+    changed, removed = plan_changes(directory_path, manifest)
+    logging.info(f"{len(changed)} new or modified PDFs, {len(removed)} removed PDFs")
+
+    for filename in removed:
+        vector_store.delete(where={'source': filename})
+        manifest.pop(filename, None)
+    if not changed:
+        save_manifest(manifest, manifest_path)
+        return
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=2048,
+        chunk_overlap=200)
+
+    chunk_counts = {filename: 0 for filename in changed}
+    failed = set()
+    unreadable = set()
+    lock = threading.Lock()
+    # Bound the number of batches held in memory while waiting to be embedded
+    in_flight = threading.BoundedSemaphore(EMBED_CONCURRENCY * 2)
+
+    def run_batch(batch):
+        sources = {doc.metadata['source'] for _, doc in batch}
+        try:
+            add_batch_with_retry(vector_store, batch)
+            with lock:
+                for _, doc in batch:
+                    chunk_counts[doc.metadata['source']] += 1
+        except Exception as e:
+            logging.error(f"Failed to embed batch from {sorted(sources)}: {e}")
+            with lock:
+                failed.update(sources)
+        finally:
+            in_flight.release()
+
+    def readable_documents():
+        for filename, text in read_pdfs_from_directory(directory_path, changed):
+            if text is None:
+                unreadable.add(filename)
+                continue
+            # Runs before the first batch of this file is submitted
+            vector_store.delete(where={'source': filename})
+            yield filename, text
+
+    with ThreadPoolExecutor(max_workers=EMBED_CONCURRENCY) as executor:
+        for batch in batched(iter_chunks(readable_documents(), text_splitter), EMBED_BATCH_SIZE):
+            in_flight.acquire()
+            executor.submit(run_batch, batch)
+
+    # Unreadable files keep their previous chunks and manifest entry, and files with a
+    # failed batch are dropped from the manifest, so the next run retries both
+    for filename, sha in changed.items():
+        if filename in unreadable:
+            continue
+        if filename in failed:
+            vector_store.delete(where={'source': filename})
+            manifest.pop(filename, None)
+            continue
+        manifest[filename] = {'sha256': sha, 'chunks': chunk_counts[filename]}
+    save_manifest(manifest, manifest_path)
+    logging.info(f"Ingested {sum(chunk_counts.values())} chunks, "
+                 f"{len(failed)} PDFs failed to embed, {len(unreadable)} PDFs could not be read")
+
+
+if __name__ == "__main__":
+    embedding_provider = get_embedding_provider()
+    vector_store = open_vector_store(embedding_provider, record=True)
+
+    ingest(vector_store)
+    build_lexical_index(vector_store, LEXICAL_INDEX_PATH)
+    export_vector_snapshot(vector_store, embedding_provider)
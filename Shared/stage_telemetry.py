@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+# Log every span as a JSON line, in addition to recording it in the metrics
+TRACE_SPANS = os.getenv("TRACE_SPANS", "0") == "1"
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+logger = logging.getLogger("telemetry")
+
+
+class StageTelemetry:
+    """
+    Times the stages of a request into one server's Prometheus histogram.
+
+    Args:
+        server: Short server name used in the metric names, e.g. "chat"
+        description: Server name used in the metric descriptions, e.g. "chat server"
+        buckets: Histogram bucket bounds in seconds
+    """
+
+    def __init__(self, server: str, description: str, buckets: Sequence[float]):
+        self.seconds = Histogram(
+            f"sevahealth_{server}_stage_seconds", f"Duration of each {description} stage", ["stage"], buckets=buckets
+        )
+        self.errors = Counter(f"sevahealth_{server}_stage_errors_total", "Stages that raised an error", ["stage"])
+
+    def observe(self, stage: str, seconds: float, status: str = "ok") -> None:
+        self.seconds.labels(stage).observe(seconds)
+        if status == "error":
+            self.errors.labels(stage).inc()
+        if TRACE_SPANS:
+            logger.info(json.dumps({
+                "request_id": request_id_var.get(),
+                "stage": stage,
+                "duration_ms": round(seconds * 1000, 2),
+                "status": status,
+            }))
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as one `stage` of the current request."""
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, status)
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """
+    Render the metrics in the Prometheus text format.
+
+    With several worker processes, set PROMETHEUS_MULTIPROC_DIR so every worker
+    writes its metrics there and each scrape sees all of them.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
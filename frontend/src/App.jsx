@@ -266,7 +266,17 @@ function App() {
               if (!message) return;
 
               // Handle different message types
-              if (message.node === 'chatbot') {
+              if (message.node === 'chatbot_token') {
+                // Incremental text from the model, the consolidated message follows
+                accumulatedContent += message.message?.content || '';
+                setMessages((prev) =>
+                  prev.map((msg) =>
+                    msg.id === assistantMessageId
+                      ? { ...msg, content: accumulatedContent }
+                      : msg
+                  )
+                );
+              } else if (message.node === 'chatbot') {
                 const messageData = message.message;
                 console.log("Chatbot message data:", messageData);
                 